@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+"""
+Generate a synthetic journal for benchmarking.
+
+Every day of the generated years has an entry. Words are drawn from a
+fixed vocabulary with a Zipf-like distribution, so that word counts and
+the word cloud resemble real journals.
+"""
+
+import argparse
+import os.path
+import random
+import sys
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(os.path.dirname(DIR))
+
+sys.path.insert(0, REPO)
+
+from rednotebook import storage
+from rednotebook.data import Month
+
+END_YEAR = 2024
+VOCABULARY_SIZE = 5000
+CATEGORIES = {
+    "Work": ["Meeting", "Review", "Release"],
+    "Sport": ["Running", "Swimming"],
+    "Todo": ["Shopping", "Call mom"],
+}
+# Alphabets (code point ranges) for non-ASCII words.
+UNICODE_ALPHABETS = [
+    (0x00E0, 0x00FF),  # Latin-1 letters with diacritics
+    (0x0430, 0x044F),  # Cyrillic
+    (0x03B1, 0x03C9),  # Greek
+    (0x4E00, 0x4FFF),  # CJK ideographs
+]
+
+
+def _make_word(rng, alphabet):
+    return "".join(
+        chr(rng.randint(*alphabet)) for _ in range(rng.randint(2, 10))
+    ).lower()
+
+
+def make_vocabulary(rng, unicode_ratio):
+    """Return the vocabulary and the weights for choosing its words."""
+    words = []
+    for _ in range(VOCABULARY_SIZE):
+        if rng.random() < unicode_ratio:
+            alphabet = rng.choice(UNICODE_ALPHABETS)
+        else:
+            alphabet = (ord("a"), ord("z"))
+        words.append(_make_word(rng, alphabet))
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    return words, weights
+
+
+def generate_months(years, words_per_day, tag_density=0.01, unicode_ratio=0.1, seed=0):
+    """
+    Return a dict mapping year-month values to months with an entry for
+    every day of the last "years" years.
+
+    tag_density is the fraction of words that are hashtags. Days get
+    category entries with a proportional probability. unicode_ratio is
+    the fraction of non-ASCII words in the vocabulary.
+    """
+    rng = random.Random(seed)
+    words, weights = make_vocabulary(rng, unicode_ratio)
+    tags = rng.sample(words, min(50, len(words)))
+    months = {}
+    for year_number in range(END_YEAR - years + 1, END_YEAR + 1):
+        for month_number in range(1, 13):
+            month = Month(year_number, month_number)
+            for day_number in range(1, 32):
+                try:
+                    day = month.get_day(day_number)
+                except ValueError:
+                    # The month has less than 31 days.
+                    break
+                text = rng.choices(words, weights, k=words_per_day)
+                for index in range(len(text)):
+                    if rng.random() < tag_density:
+                        text[index] = "#" + rng.choice(tags)
+                lines = [" ".join(text[i : i + 12]) for i in range(0, len(text), 12)]
+                content = {"text": "\n".join(lines)}
+                if rng.random() < min(1, tag_density * 20):
+                    category = rng.choice(sorted(CATEGORIES))
+                    content[category] = {rng.choice(CATEGORIES[category]): None}
+                day.content = content
+            key = storage.format_year_and_month(year_number, month_number)
+            months[key] = month
+    return months
+
+
+def add_arguments(parser):
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--words-per-day", type=int, default=200)
+    parser.add_argument(
+        "--tag-density",
+        type=float,
+        default=0.01,
+        help="fraction of words that are hashtags (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--unicode-ratio",
+        type=float,
+        default=0.1,
+        help="fraction of non-ASCII words (default: %(default)s)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("journal_dir", help="empty or non-existing directory")
+    add_arguments(parser)
+    args = parser.parse_args()
+    os.makedirs(args.journal_dir, exist_ok=True)
+    if os.listdir(args.journal_dir):
+        sys.exit(f"{args.journal_dir} is not empty")
+    months = generate_months(
+        args.years, args.words_per_day, args.tag_density, args.unicode_ratio, args.seed
+    )
+    storage.save_months_to_disk(months, args.journal_dir, saveas=True)
+    print(f"Wrote {len(months)} months to {args.journal_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+"""
+Report the memory used by the loaded months of a synthetic journal.
+"""
+
+import argparse
+import os.path
+import sys
+import tracemalloc
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(os.path.dirname(DIR))
+
+sys.path.insert(0, REPO)
+
+import generate_journal
+from rednotebook import storage
+from rednotebook.data import Month
+
+
+def get_allocated_bytes(function):
+    """Return the result of function and the size of the memory it kept."""
+    tracemalloc.start()
+    result = function()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    generate_journal.add_arguments(parser)
+    parser.set_defaults(years=30, words_per_day=50)
+    args = parser.parse_args()
+
+    months = generate_journal.generate_months(
+        args.years, args.words_per_day, args.tag_density, args.unicode_ratio, args.seed
+    )
+    contents = [
+        (month.year_number, month.month_number, storage._get_dict(month))
+        for month in months.values()
+    ]
+    del months
+    number_of_days = sum(len(month_contents) for _, _, month_contents in contents)
+
+    copies, content_bytes = get_allocated_bytes(
+        lambda: [
+            {day: dict(day_content) for day, day_content in month_contents.items()}
+            for _, _, month_contents in contents
+        ]
+    )
+    loaded_months, month_bytes = get_allocated_bytes(
+        lambda: [
+            Month(year_number, month_number, month_contents)
+            for (year_number, month_number, _), month_contents in zip(contents, copies)
+        ]
+    )
+
+    def visit_all_dates_of_empty_months():
+        empty_months = [
+            Month(year_number, month_number)
+            for year_number, month_number, _ in contents
+        ]
+        for month in empty_months:
+            for day_number in range(1, 32):
+                try:
+                    month.get_day(day_number)
+                except ValueError:
+                    break
+        return empty_months
+
+    empty_months, empty_month_bytes = get_allocated_bytes(
+        visit_all_dates_of_empty_months
+    )
+
+    print(f"Stored days: {number_of_days}")
+    print(f"Content dict bytes per day: {content_bytes / number_of_days:.0f}")
+    print(f"Day and month bytes per day: {month_bytes / number_of_days:.0f}")
+    print(
+        f"Bytes per empty month after visiting all its dates: "
+        f"{empty_month_bytes / len(empty_months):.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+"""
+Compare the full and the fast validation of written month files.
+"""
+
+import os.path
+import random
+import sys
+import tempfile
+import timeit
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(os.path.dirname(DIR))
+
+sys.path.insert(0, REPO)
+
+from rednotebook import storage
+from rednotebook.data import Month
+
+WORDS = ["journal", "today", "meeting", "Straße", "café", "日記", "#work", "**bold**"]
+WORDS_PER_DAY = [100, 1000, 5000]
+ITERATIONS = 10
+
+
+def make_month(words_per_day):
+    rng = random.Random(0)
+    month = Month(2020, 1)
+    for day_number in range(1, 32):
+        lines = [
+            " ".join(rng.choice(WORDS) for _ in range(10))
+            for _ in range(words_per_day // 10)
+        ]
+        month.get_day(day_number).text = "\n".join(lines)
+    return month
+
+
+for words_per_day in WORDS_PER_DAY:
+    month = make_month(words_per_day)
+    with tempfile.TemporaryDirectory() as journal_dir:
+        backend = storage.YamlBackend(journal_dir)
+        for fast_validation in [False, True]:
+            timer = timeit.Timer(
+                lambda: backend.save_months(
+                    {"2020-01": month}, saveas=True, fast_validation=fast_validation
+                )
+            )
+            mode = "fast" if fast_validation else "full"
+            print(words_per_day, mode, timer.timeit(ITERATIONS) / ITERATIONS)
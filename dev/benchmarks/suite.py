@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+
+"""
+Time storage, search, statistics and markup operations on a synthetic
+journal and write the results to a JSON file.
+
+Compare two runs with --compare old.json.
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os.path
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(os.path.dirname(DIR))
+
+sys.path.insert(0, REPO)
+
+import generate_journal
+from rednotebook import query, storage
+from rednotebook.data import DayIndex
+
+
+def measure(function, repeat):
+    """Return the best and median runtime of function in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {"best": min(times), "median": statistics.median(times)}
+
+
+def import_journal_module():
+    """
+    Import rednotebook.journal, which needs GTK, parses the command line
+    and redirects the output to its log file.
+    """
+    # The module exits if it cannot import GTK.
+    if importlib.util.find_spec("gi") is None:
+        raise ImportError("pygobject is not installed")
+    argv = sys.argv
+    sys.argv = argv[:1]
+    try:
+        from rednotebook import journal
+    finally:
+        sys.argv = argv
+    sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    logging.getLogger().setLevel(logging.WARNING)
+    return journal
+
+
+def make_journal(journal_module, months):
+    """Return a journal without a window that uses the real Journal methods."""
+    from rednotebook.configuration import Config
+
+    journal_class = journal_module.Journal
+
+    class HeadlessJournal:
+        config = Config(os.devnull)
+        frame = None
+        month_catalog = {}
+        days = journal_class.days
+        get_day_index = journal_class.get_day_index
+        load_all_months = journal_class.load_all_months
+        iter_search = journal_class.iter_search
+        get_days_with_tags = journal_class.get_days_with_tags
+        get_word_count_dict = journal_class.get_word_count_dict
+
+    journal = HeadlessJournal()
+    journal.months = months
+    journal.day_index = DayIndex()
+    for month in months.values():
+        journal.day_index.add_month(month)
+    return journal
+
+
+def run_storage_benchmarks(months, journal_dir, repeat, results):
+    cache = storage.MonthCache(journal_dir).path
+
+    def load_cold():
+        if os.path.exists(cache):
+            os.remove(cache)
+        storage.load_all_months_from_disk(journal_dir)
+
+    results["load_all_months_from_disk (no cache)"] = measure(load_cold, repeat)
+    storage.load_all_months_from_disk(journal_dir)
+    results["load_all_months_from_disk"] = measure(
+        lambda: storage.load_all_months_from_disk(journal_dir), repeat
+    )
+    results["save_months_to_disk (all months)"] = measure(
+        lambda: storage.save_months_to_disk(months, journal_dir, saveas=True),
+        repeat,
+    )
+
+    last_month = months[max(months)]
+
+    def save_one_day():
+        day = last_month.get_day(1)
+        day.text += " edit"
+        storage.save_months_to_disk(months, journal_dir)
+
+    results["save_months_to_disk (one day)"] = measure(save_one_day, repeat)
+
+
+def run_search_benchmarks(months, repeat, results):
+    """Compare searching all days to searching the days found by the index."""
+    index = DayIndex()
+    for month in months.values():
+        index.add_month(month)
+    days = index.days
+    # Pick a rare word to simulate typing a specific search.
+    text = sorted(days[-1].text.split(), key=len)[-1][:5]
+
+    results["Day.search (all days)"] = measure(
+        lambda: [day.search(text, []) for day in days], repeat
+    )
+    index.search_days(text, [])
+    results["Day.search (indexed days)"] = measure(
+        lambda: [day.search(text, []) for day in index.search_days(text, [])], repeat
+    )
+    word = text.lstrip("#")
+    parsed_query = query.parse(f"{word} OR ({word[:3]} NOT {word[1:4]}) date:2020..")
+    search_days = index.search_days(text, [])
+    results["DayIndex.rank_days"] = measure(
+        lambda: index.rank_days(text, search_days), repeat
+    )
+    results["query.search"] = measure(
+        lambda: list(query.search(index, parsed_query)), repeat
+    )
+
+    index.get_word_counts()
+
+    def count_words_after_edit():
+        days[-1].text += " edit"
+        index.get_word_counts()
+
+    results["DayIndex.get_word_counts (after edit)"] = measure(
+        count_words_after_edit, repeat
+    )
+    last_date = index.dates[-1]
+    results["DayIndex.get_word_counts (one year)"] = measure(
+        lambda: index.get_word_counts(last_date.replace(month=1, day=15), last_date),
+        repeat,
+    )
+
+
+def run_journal_benchmarks(months, journal_dir, repeat, results):
+    journal_module = import_journal_module()
+    from rednotebook.util import markup
+    from rednotebook.util.statistics import Statistics
+
+    journal = make_journal(journal_module, months)
+    days = journal.days
+    some_word = days[-1].text.split()[0]
+    some_tag = days[-1].hashtags[0] if days[-1].hashtags else "work"
+
+    results["Journal.days"] = measure(lambda: journal.days, repeat)
+    results["Journal.iter_search (text)"] = measure(
+        lambda: list(journal.iter_search(some_word, [])), repeat
+    )
+    results["Journal.iter_search (tag)"] = measure(
+        lambda: list(journal.iter_search("", [some_tag])), repeat
+    )
+    journal.config["rankSearchResults"] = 1
+    results["Journal.iter_search (ranked)"] = measure(
+        lambda: list(journal.iter_search(some_word, [])), repeat
+    )
+    journal.config["rankSearchResults"] = 0
+    results["Journal.get_word_count_dict"] = measure(
+        journal.get_word_count_dict, repeat
+    )
+
+    stats = Statistics(journal)
+
+    def overall_pairs():
+        stats.days = journal.days
+        return stats.overall_pairs
+
+    results["Statistics.overall_pairs"] = measure(overall_pairs, repeat)
+
+    texts = [day.text for day in days[-31:]]
+
+    def convert():
+        for text in texts:
+            markup.convert(text, "xhtml", journal_dir)
+
+    results["markup.convert (31 days)"] = measure(convert, repeat)
+
+
+def compare(old_results, new_results):
+    for name, new in new_results.items():
+        old = old_results.get(name)
+        if old is None:
+            continue
+        ratio = new["best"] / old["best"] if old["best"] else float("inf")
+        print(f"{name:45} {old['best']:9.4f}s -> {new['best']:9.4f}s  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    generate_journal.add_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--output", default="benchmark.json", help="default: %(default)s"
+    )
+    parser.add_argument("--compare", metavar="OLD_JSON")
+    args = parser.parse_args()
+
+    parameters = {
+        "years": args.years,
+        "words_per_day": args.words_per_day,
+        "tag_density": args.tag_density,
+        "unicode_ratio": args.unicode_ratio,
+        "seed": args.seed,
+    }
+    months = generate_journal.generate_months(**parameters)
+    results = {}
+    skipped = {}
+    journal_dir = tempfile.mkdtemp(prefix="rednotebook-benchmark-")
+    try:
+        storage.save_months_to_disk(months, journal_dir, saveas=True)
+        run_storage_benchmarks(months, journal_dir, args.repeat, results)
+        run_search_benchmarks(months, args.repeat, results)
+        try:
+            run_journal_benchmarks(months, journal_dir, args.repeat, results)
+        except ImportError as err:
+            skipped["journal"] = str(err)
+            logging.warning(f"Skipping journal benchmarks: {err}")
+    finally:
+        shutil.rmtree(journal_dir)
+
+    for name, result in results.items():
+        print(f"{name:45} {result['best']:9.4f}s")
+
+    report = {
+        "parameters": parameters,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+        "skipped": skipped,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f)["results"], results)
+
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,13 @@ Journal.do_activate
 Journal.do_command_line
 Journal.do_startup
 
+from rednotebook import storage
+
+# Used by the scripts in scripts/.
+storage.BACKENDS
+storage.load_all_months_from_disk
+storage.save_months_to_disk
+
 from gi.repository import Gtk
 
 cell = Gtk.CellRendererText()
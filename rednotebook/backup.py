@@ -93,6 +93,7 @@ class Archiver:
             return
 
         self.journal.save_to_disk()
+        self.journal.finish_pending_saves()
         data_dir = self.journal.dirs.data_dir
         archive_files = []
         for root, _, files in os.walk(data_dir):
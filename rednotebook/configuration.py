@@ -51,6 +51,12 @@ class Config(dict):
         "leftDividerPosition": 260,
         "rightDividerPosition": None,
         "cloudMaxTags": 1000,
+        "cloudPeriod": "",
+        "lazyLoading": 1,
+        "fastSaveValidation": 1,
+        "watchJournal": 1,
+        "fuzzySearch": 0,
+        "rankSearchResults": 0,
     }
 
     obsolete_keys = {
@@ -16,11 +16,20 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 # -----------------------------------------------------------------------
 
+import bisect
+import calendar
+import collections
 import datetime
+import functools
+import math
 import re
+import sys
+import types
 
 
 TEXT_RESULT_LENGTH = 42
+# Searches for these characters may match the date of a day.
+DATE_CHARACTERS = set("0123456789-")
 
 ALPHA = r"[^\W\d_]"
 ALPHA_NUMERIC = r"\w"
@@ -38,6 +47,12 @@ def escape_tag(tag):
     return tag.lower().replace(" ", "_")
 
 
+@functools.lru_cache(maxsize=128)
+def casefold(text):
+    """Return the case-folded search text (cached for searching many days)."""
+    return text.casefold()
+
+
 def get_text_with_dots(text, start, end, found_text=None):
     """
     Find the outermost spaces and innermost newlines around
@@ -84,6 +99,16 @@ def get_text_with_dots(text, start, end, found_text=None):
 
 
 class Day:
+    __slots__ = (
+        "month",
+        "date",
+        "_content",
+        "version",
+        "edited",
+        "_cache",
+        "_cache_version",
+    )
+
     def __init__(self, month, day_number, day_content=None):
         day_content = day_content or {"text": ""}
         assert "text" in day_content, day_content
@@ -96,29 +121,64 @@ class Day:
         old_tags = day_content.pop("Tags", None) or {}
         for old_tag in old_tags:
             day_content[old_tag] = None
-            self.month.edited = True
 
         self._content = day_content
 
+        # The version is increased whenever the content changes. Days are
+        # edited until their content has been handed to the storage backend.
+        self.version = 0
+        self.edited = bool(old_tags)
+
+        # Values derived from the content and the version they belong to.
+        self._cache = None
+        self._cache_version = None
+
+    def _mark_edited(self, old_content):
+        self.version += 1
+        self.edited = True
+        # Days that were empty are only added to the month when edited.
+        self.month.days.setdefault(self.date.day, self)
+        if self.month.index is not None:
+            # Let the index subtract what it counted for the old content.
+            old_day = Day(self.month, self.date.day, old_content)
+            self.month.index.update_day(self, old_day)
+
     def _get_content(self):
         return self._content
 
     def _set_content(self, content):
-        old_text = self.text
-        new_text = content["text"]
-        content["text"] = old_text
+        assert "text" in content, content
+        old_content = self._content
         self._content = content
-        self.text = new_text
+        if content != old_content:
+            self._mark_edited(old_content)
 
     content = property(_get_content, _set_content)
 
+    def _get_cached(self, key, compute):
+        """
+        Return the value computed by compute() for the current content.
+        The returned value is shared and must not be modified.
+        """
+        if self._cache_version != self.version:
+            self._cache = {}
+            self._cache_version = self.version
+        try:
+            return self._cache[key]
+        except KeyError:
+            value = self._cache[key] = compute()
+            return value
+
     def _get_text(self):
         """Return the day's text as a unicode string."""
         return self.content["text"]
 
     def _set_text(self, text):
         assert "text" in self.content
-        self.content["text"] = text
+        if text != self.content["text"]:
+            old_content = dict(self.content)
+            self.content["text"] = text
+            self._mark_edited(old_content)
 
     text = property(_get_text, _set_text)
 
@@ -137,15 +197,12 @@ class Day:
 
     @property
     def categories(self):
-        return list(self.get_category_content_pairs().keys())
+        return list(self._get_category_content_pairs())
 
     def get_entries(self, category):
         return sorted((self.content.get(category) or {}).keys())
 
-    def get_category_content_pairs(self):
-        """
-        Returns a dict of (category: content_in_category_as_list) pairs.
-        """
+    def _find_category_content_pairs(self):
         pairs = {}
         for category, content in self.content.items():
             if category == "text":
@@ -154,15 +211,28 @@ class Day:
                 pairs[category] = []
             else:
                 pairs[category] = list(content.keys())
-        # Include hashtags
+        # Include hashtags. The pairs are cached, so the text is only
+        # searched once per version.
         for tag in self.hashtags:
             pairs[tag] = []
         return pairs
 
+    def _get_category_content_pairs(self):
+        return self._get_cached("pairs", self._find_category_content_pairs)
+
+    def get_category_content_pairs(self):
+        """
+        Returns a dict of (category: content_in_category_as_list) pairs.
+        """
+        return {
+            category: list(content)
+            for category, content in self._get_category_content_pairs().items()
+        }
+
     def get_words(self, with_special_chars=False):
         categories_text = " ".join(
             " ".join([category] + content)
-            for category, content in self.get_category_content_pairs().items()
+            for category, content in self._get_category_content_pairs().items()
         )
 
         all_text = f"{self.text} {categories_text}"
@@ -176,7 +246,35 @@ class Day:
         return [word for word in words if word]
 
     def get_number_of_words(self):
-        return len(self.get_words(with_special_chars=True))
+        return self._get_cached(
+            "number_of_words", lambda: len(self.get_words(with_special_chars=True))
+        )
+
+    def _find_search_form(self):
+        text = self.text.casefold()
+        # Case folding may change the length of characters (e.g. "ß" -> "ss").
+        # Then map the offsets in the folded text to offsets in the text.
+        positions = None
+        if len(text) != len(self.text):
+            positions = []
+            for position, char in enumerate(self.text):
+                positions.extend([position] * len(char.casefold()))
+        categories = [
+            (
+                category.casefold(),
+                category,
+                [(entry.casefold(), entry) for entry in entries],
+            )
+            for category, entries in self._get_category_content_pairs().items()
+        ]
+        return self.date.isoformat(), text, positions, categories
+
+    def _get_search_form(self):
+        """
+        Return the date string, the case-folded text, the offset mapping
+        and the case-folded categories and entries used for searching.
+        """
+        return self._get_cached("search_form", self._find_search_form)
 
     def search(self, text, tags):
         """
@@ -184,11 +282,12 @@ class Day:
         Search in date first, then in the text, then in the tags.
         Uses case-insensitive search.
         """
+        date_string = self._get_search_form()[0]
         results = []
         if not text:
             # Only add text result once for all tags.
             add_text_to_results = False
-            for day_tag, entries in self.get_category_content_pairs().items():
+            for day_tag, entries in self._get_category_content_pairs().items():
                 for tag in tags:
                     # We know that all tags are present, but we loop through
                     # day_tags nonetheless, to escape the day_tags.
@@ -200,38 +299,64 @@ class Day:
                         add_text_to_results = True
             if add_text_to_results:
                 results.append(get_text_with_dots(self.text, 0, TEXT_RESULT_LENGTH))
-        elif text in str(self):
+        elif text in date_string:
             # Date contains searched text.
             results.append(get_text_with_dots(self.text, 0, TEXT_RESULT_LENGTH))
         else:
             if text_result := self.search_in_text(text):
                 results.append(text_result)
             results.extend(self.search_in_categories(text))
-        return str(self), results
+        return date_string, results
+
+    def _get_offsets(self, start, end, positions):
+        """Return the offsets in the text for offsets in the folded text."""
+        if positions is None:
+            return start, end
+        return positions[start], positions[end - 1] + 1
 
     def search_in_text(self, search_text):
-        occurrence = self.text.upper().find(search_text.upper())
+        _date_string, text, positions, _categories = self._get_search_form()
+        search_text = casefold(search_text)
+        occurrence = text.find(search_text)
 
         # Check if search_text is in text
         if occurrence < 0:
             return None
 
-        found_text = self.text[occurrence : occurrence + len(search_text)]
-        return get_text_with_dots(
-            self.text, occurrence, occurrence + len(search_text), found_text
+        start, end = self._get_offsets(
+            occurrence, occurrence + len(search_text), positions
         )
+        return get_text_with_dots(self.text, start, end, self.text[start:end])
+
+    def get_match_offsets(self, search_text):
+        """
+        Return the (start, end) offsets of all case-insensitive occurrences
+        of search_text in the text.
+        """
+        _date_string, text, positions, _categories = self._get_search_form()
+        search_text = casefold(search_text)
+        if not search_text:
+            return []
+        offsets = []
+        start = text.find(search_text)
+        while start >= 0:
+            end = start + len(search_text)
+            offsets.append(self._get_offsets(start, end, positions))
+            start = text.find(search_text, end)
+        return offsets
 
     def search_in_categories(self, text):
+        text = casefold(text)
         results = []
-        for category, content in self.get_category_content_pairs().items():
-            if content:
-                if text.upper() in category.upper():
-                    results.extend(content)
+        for folded_category, category, entries in self._get_search_form()[3]:
+            if entries:
+                if text in folded_category:
+                    results.extend(entry for _folded_entry, entry in entries)
                 else:
                     results.extend(
-                        entry for entry in content if text.upper() in entry.upper()
+                        entry for folded_entry, entry in entries if text in folded_entry
                     )
-            elif text.upper() in category.upper():
+            elif text in folded_category:
                 results.append(category)
         return results
 
@@ -240,22 +365,66 @@ class Day:
 
 
 class Month:
+    __slots__ = (
+        "year_number",
+        "month_number",
+        "days",
+        "_edited",
+        "mtime",
+        "_empty_day",
+        "index",
+    )
+
     def __init__(self, year_number, month_number, month_content=None, mtime=0):
         self.year_number = year_number
         self.month_number = month_number
 
         month_content = month_content or {}
+        # Only days with content are stored.
         self.days = {}
         for day_number, day_content in month_content.items():
-            self.days[day_number] = Day(self, day_number, day_content)
-
-        self.edited = False
+            day = Day(self, day_number, day_content)
+            if not day.empty:
+                self.days[day_number] = day
+        # The empty day that was requested last. It is added to the days
+        # once it is edited.
+        self._empty_day = None
+        # The DayIndex that is notified when a day is edited.
+        self.index = None
+
+        # Set when the whole month has to be stored again, e.g. after a
+        # failed save. Otherwise only the edited days need to be stored.
+        self._edited = False
         self.mtime = mtime
 
+    def _get_edited(self):
+        return self._edited or any(day.edited for day in self.days.values())
+
+    def _set_edited(self, edited):
+        self._edited = edited
+        if not edited:
+            for day in self.days.values():
+                day.edited = False
+
+    edited = property(_get_edited, _set_edited)
+
+    @property
+    def edited_days(self):
+        """
+        Return the numbers of the days that changed since the last save or
+        None if all days have to be stored.
+        """
+        if self._edited:
+            return None
+        return {day_number for day_number, day in self.days.items() if day.edited}
+
     def get_day(self, day_number):
-        if day_number not in self.days:
-            self.days[day_number] = Day(self, day_number)
-        return self.days[day_number]
+        day = self.days.get(day_number)
+        if day is None:
+            day = self._empty_day
+            if day is None or day.date.day != day_number:
+                day = self._empty_day = Day(self, day_number)
+        return day
 
     def __str__(self):
         lines = [f"Month {self.year_number} {self.month_number}"]
@@ -267,3 +436,583 @@ class Month:
     @property
     def empty(self):
         return all(day.empty for day in self.days.values())
+
+
+def get_trigrams(word, pad=False):
+    """
+    Return the set of substrings of length three of word. Padding adds
+    trigrams for the start and end of the word, which helps to compare
+    short words.
+    """
+    if pad:
+        word = f"  {word} "
+    return {word[i : i + 3] for i in range(len(word) - 2)}
+
+
+class TextIndex:
+    """
+    Map the case-folded, whitespace-separated tokens of the text, the
+    categories and the entries of days to the dates of the days.
+
+    A search text without whitespace can only be found in a day if it is
+    part of one of the day's tokens. This lets us find candidate days by
+    looking at the distinct tokens instead of the texts of all days. The
+    tokens containing a search text of three or more characters are found
+    with a trigram index of the tokens.
+
+    The index also counts the tokens of each day for ranking days with
+    the BM25 formula.
+    """
+
+    # Minimum share of common trigrams for fuzzy matches.
+    MIN_SIMILARITY = 0.4
+    # BM25 parameters for the saturation of token counts and the
+    # normalization of day lengths.
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        # Map dates to dicts mapping tokens to their number of occurrences.
+        self._tokens_by_date = {}
+        self._dates_by_token = {}
+        self._tokens_by_trigram = {}
+        self._lengths_by_date = {}
+        self._total_length = 0
+
+    @staticmethod
+    def _get_tokens(day):
+        parts = [day.text]
+        for category, entries in day._get_category_content_pairs().items():
+            parts.append(category)
+            parts.extend(entries)
+        counts = collections.Counter("\n".join(parts).casefold().split())
+        # Interning lets days share the strings of common tokens.
+        return {sys.intern(token): count for token, count in counts.items()}
+
+    def add_day(self, day):
+        tokens = self._tokens_by_date[day.date] = self._get_tokens(day)
+        length = self._lengths_by_date[day.date] = sum(tokens.values())
+        self._total_length += length
+        for token in tokens:
+            if token not in self._dates_by_token:
+                self._dates_by_token[token] = set()
+                for trigram in get_trigrams(token, pad=True):
+                    self._tokens_by_trigram.setdefault(trigram, set()).add(token)
+            self._dates_by_token[token].add(day.date)
+
+    def remove_day(self, day):
+        date = day.date
+        self._total_length -= self._lengths_by_date.pop(date, 0)
+        for token in self._tokens_by_date.pop(date, ()):
+            dates = self._dates_by_token[token]
+            dates.discard(date)
+            if not dates:
+                del self._dates_by_token[token]
+                for trigram in get_trigrams(token, pad=True):
+                    tokens = self._tokens_by_trigram[trigram]
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._tokens_by_trigram[trigram]
+
+    def _find_tokens(self, part):
+        """Return the tokens that contain part."""
+        if len(part) < 3:
+            tokens = self._dates_by_token
+        else:
+            token_sets = sorted(
+                (
+                    self._tokens_by_trigram.get(trigram, set())
+                    for trigram in get_trigrams(part)
+                ),
+                key=len,
+            )
+            tokens = set.intersection(*token_sets)
+        return [token for token in tokens if part in token]
+
+    def get_candidate_dates(self, text):
+        """
+        Return the dates of all days that may contain text (see Day.search)
+        or None if all days may contain it.
+        """
+        parts = casefold(text).split()
+        if not parts or set(text) <= DATE_CHARACTERS:
+            return None
+        return self.get_token_dates(parts)
+
+    def get_token_dates(self, parts):
+        """
+        Return the dates of the days with tokens containing all case-folded
+        parts.
+        """
+        candidates = None
+        # Every part of the search text must be contained in a token.
+        for part in sorted(parts, key=len, reverse=True):
+            dates = set()
+            for token in self._find_tokens(part):
+                dates |= self._dates_by_token[token]
+            candidates = dates if candidates is None else candidates & dates
+            if not candidates:
+                break
+        return candidates
+
+    def get_scores(self, text, dates):
+        """
+        Return a dict mapping the given dates to the BM25 scores of their
+        days for text. A token containing a part of text counts as an
+        occurrence of the part.
+        """
+        scores = dict.fromkeys(dates, 0.0)
+        if not self._tokens_by_date:
+            return scores
+        number_of_days = len(self._tokens_by_date)
+        average_length = self._total_length / number_of_days or 1
+        for part in set(casefold(text).split()):
+            dates_with_part = set()
+            counts = {}
+            for token in self._find_tokens(part):
+                token_dates = self._dates_by_token[token]
+                dates_with_part |= token_dates
+                for date in token_dates & scores.keys():
+                    counts[date] = (
+                        counts.get(date, 0) + self._tokens_by_date[date][token]
+                    )
+            days_with_part = len(dates_with_part)
+            idf = math.log(
+                1 + (number_of_days - days_with_part + 0.5) / (days_with_part + 0.5)
+            )
+            for date, count in counts.items():
+                length = self._lengths_by_date[date] / average_length
+                scores[date] += (
+                    idf
+                    * count
+                    * (self.K1 + 1)
+                    / (count + self.K1 * (1 - self.B + self.B * length))
+                )
+        return scores
+
+    def _find_similar_tokens(self, part):
+        """Return a dict mapping tokens similar to part to their similarity."""
+        trigrams = get_trigrams(part, pad=True)
+        common_trigrams = {}
+        for trigram in trigrams:
+            for token in self._tokens_by_trigram.get(trigram, ()):
+                common_trigrams[token] = common_trigrams.get(token, 0) + 1
+        similar_tokens = {}
+        for token, common in common_trigrams.items():
+            # Jaccard similarity of the trigram sets.
+            token_trigrams = len(get_trigrams(token, pad=True))
+            similarity = common / (len(trigrams) + token_trigrams - common)
+            if similarity >= self.MIN_SIMILARITY:
+                similar_tokens[token] = similarity
+        return similar_tokens
+
+    def get_similar_dates(self, text):
+        """
+        Return (date, token, similarity) triples for the days that contain
+        tokens similar to all parts of text, most similar first. The token
+        is the best match for the longest part.
+        """
+        parts = sorted(casefold(text).split(), key=len, reverse=True)
+        scores = None
+        for part in parts:
+            best = {}
+            for token, similarity in self._find_similar_tokens(part).items():
+                for date in self._dates_by_token[token]:
+                    if similarity > best.get(date, (0, None))[0]:
+                        best[date] = (similarity, token)
+            if scores is None:
+                scores = {
+                    date: [similarity, token]
+                    for date, (similarity, token) in best.items()
+                }
+            else:
+                scores = {
+                    date: [score[0] + best[date][0], score[1]]
+                    for date, score in scores.items()
+                    if date in best
+                }
+        if not scores:
+            return []
+        matches = [
+            (date, token, similarity) for date, (similarity, token) in scores.items()
+        ]
+        # Show the newest of equally similar days first.
+        return sorted(matches, key=lambda match: (-match[2], -match[0].toordinal()))
+
+
+class SearchCache:
+    """
+    LRU cache mapping recent (text, tags) searches to the dates of the
+    days they found. Every day found for a text is also found for all
+    parts of the text and for fewer tags, so a refined search only has to
+    look at the days of a cached search it extends.
+
+    The cache is cleared when the version of the searched days changes.
+    """
+
+    SIZE = 16
+
+    def __init__(self):
+        self._dates_by_query = collections.OrderedDict()
+        self._version = None
+
+    def _check_version(self, version):
+        if version != self._version:
+            self._dates_by_query.clear()
+            self._version = version
+
+    def get_dates(self, text, tags, version):
+        """
+        Return the smallest set of dates that contains all days found for
+        text and tags or None if no cached search can be refined.
+        """
+        self._check_version(version)
+        text = casefold(text)
+        tags = frozenset(tags)
+        best = None
+        for query, dates in self._dates_by_query.items():
+            cached_text, cached_tags = query
+            if cached_text in text and cached_tags <= tags:
+                if best is None or len(dates) < len(self._dates_by_query[best]):
+                    best = query
+        if best is None:
+            return None
+        self._dates_by_query.move_to_end(best)
+        return self._dates_by_query[best]
+
+    def add(self, text, tags, version, dates):
+        self._check_version(version)
+        query = (casefold(text), frozenset(tags))
+        self._dates_by_query[query] = frozenset(dates)
+        self._dates_by_query.move_to_end(query)
+        if len(self._dates_by_query) > self.SIZE:
+            self._dates_by_query.popitem(last=False)
+
+
+class Counts:
+    """
+    Count the keys returned by get_keys(day) for the days of a DayIndex,
+    e.g. their words. The counts are kept per month and for all days, and
+    they are updated per day, so they never have to be recounted. The days
+    of months that are only partly in a date range are counted on demand.
+    """
+
+    def __init__(self, get_keys, get_days_in_date_range):
+        self._get_keys = get_keys
+        self._get_days_in_date_range = get_days_in_date_range
+        self._counts_by_month = {}
+        self._counts = {}
+
+    @staticmethod
+    def _add(counts, other_counts, sign=1):
+        for key, count in other_counts.items():
+            count = counts.get(key, 0) + sign * count
+            if count:
+                counts[key] = count
+            else:
+                del counts[key]
+
+    def _add_day(self, day, sign):
+        counts = collections.Counter(self._get_keys(day))
+        month = (day.date.year, day.date.month)
+        month_counts = self._counts_by_month.setdefault(month, {})
+        self._add(month_counts, counts, sign)
+        if not month_counts:
+            del self._counts_by_month[month]
+        self._add(self._counts, counts, sign)
+
+    def add_day(self, day):
+        self._add_day(day, 1)
+
+    def remove_day(self, day):
+        """Subtract the counts of the day's content when it was added."""
+        self._add_day(day, -1)
+
+    def get_counts(self, start_date=None, end_date=None):
+        """
+        Return a read-only dict mapping keys to their counts in the days
+        between start_date and end_date (inclusive, None for no limit).
+        Whole months are counted with their month counts.
+        """
+        if start_date is None and end_date is None:
+            return types.MappingProxyType(self._counts)
+        counts = {}
+        for (year, month), month_counts in sorted(self._counts_by_month.items()):
+            first_day = datetime.date(year, month, 1)
+            last_day = datetime.date(year, month, calendar.monthrange(year, month)[1])
+            if (start_date is not None and last_day < start_date) or (
+                end_date is not None and first_day > end_date
+            ):
+                continue
+            if (start_date is None or start_date <= first_day) and (
+                end_date is None or last_day <= end_date
+            ):
+                self._add(counts, month_counts)
+                continue
+            for day in self._get_days_in_date_range(
+                max(first_day, start_date or first_day),
+                min(last_day, end_date or last_day),
+            ):
+                self._add(counts, collections.Counter(self._get_keys(day)))
+        return types.MappingProxyType(counts)
+
+
+def _get_lower_case_words(day):
+    return (word.lower() for word in day.get_words())
+
+
+def _get_categories(day):
+    return day.categories
+
+
+class DayIndex:
+    """
+    Date-sorted index of the non-empty days of a set of months. It also
+    maps categories and escaped tags to the dates of the days using them.
+
+    Months are added with add_month(). The index is updated whenever a day
+    of an added month is edited.
+    """
+
+    def __init__(self):
+        # Incremented whenever a day is added, edited or removed.
+        self.version = 0
+        self._dates = []
+        self._days = []
+        self._categories_by_date = {}
+        self._dates_by_category = {}
+        self._dates_by_tag = {}
+        # Only built when text is searched or words and categories are
+        # counted for the first time.
+        self._text_index = None
+        self._word_counts = None
+        self._category_counts = None
+        self._search_cache = SearchCache()
+
+    def add_month(self, month):
+        month.index = self
+        for day in month.days.values():
+            self.update_day(day)
+
+    def remove_month(self, month):
+        month.index = None
+        self.version += 1
+        first_date = datetime.date(month.year_number, month.month_number, 1)
+        start = bisect.bisect_left(self._dates, first_date)
+        end = start
+        while end < len(self._dates) and self._days[end].month is month:
+            self._remove_categories(self._dates[end])
+            for index in self._get_built_indexes():
+                index.remove_day(self._days[end])
+            end += 1
+        del self._dates[start:end]
+        del self._days[start:end]
+
+    def update_day(self, day, old_day=None):
+        """
+        Add, update or remove the day. If the day was edited, old_day holds
+        its previous content.
+        """
+        self.version += 1
+        pos = bisect.bisect_left(self._dates, day.date)
+        present = pos < len(self._dates) and self._dates[pos] == day.date
+        if present:
+            self._remove_categories(day.date)
+            for index in self._get_built_indexes():
+                index.remove_day(old_day or self._days[pos])
+        if day.empty:
+            if present:
+                del self._dates[pos]
+                del self._days[pos]
+            return
+        if present:
+            self._days[pos] = day
+        else:
+            self._dates.insert(pos, day.date)
+            self._days.insert(pos, day)
+        self._add_categories(day)
+        for index in self._get_built_indexes():
+            index.add_day(day)
+
+    def _get_built_indexes(self):
+        return [
+            index
+            for index in (self._text_index, self._word_counts, self._category_counts)
+            if index is not None
+        ]
+
+    def _add_categories(self, day):
+        categories = self._categories_by_date[day.date] = tuple(day.categories)
+        for category in categories:
+            self._dates_by_category.setdefault(category, set()).add(day.date)
+        for tag in {escape_tag(category) for category in categories}:
+            self._dates_by_tag.setdefault(tag, set()).add(day.date)
+
+    def _remove_categories(self, date):
+        categories = self._categories_by_date.pop(date, ())
+        for category in categories:
+            self._discard(self._dates_by_category, category, date)
+        for tag in {escape_tag(category) for category in categories}:
+            self._discard(self._dates_by_tag, tag, date)
+
+    @staticmethod
+    def _discard(dates_by_key, key, date):
+        dates = dates_by_key[key]
+        dates.discard(date)
+        if not dates:
+            del dates_by_key[key]
+
+    def get_days(self, dates):
+        """Return the days of the given dates in date order."""
+        return [
+            self._days[bisect.bisect_left(self._dates, date)] for date in sorted(dates)
+        ]
+
+    @property
+    def dates(self):
+        return list(self._dates)
+
+    @property
+    def days(self):
+        return list(self._days)
+
+    @property
+    def categories(self):
+        """Return the categories and hashtags of all days in no order."""
+        return list(self._dates_by_category)
+
+    def get_dates_with_tags(self, tags):
+        """Return the dates of the days that have all of the given escaped tags."""
+        return set.intersection(*(self._dates_by_tag.get(tag, set()) for tag in tags))
+
+    def get_days_with_tags(self, tags):
+        """Return the days that have all of the given escaped tags."""
+        if not tags:
+            return self.days
+        return self.get_days(self.get_dates_with_tags(tags))
+
+    def _get_counts(self, attribute, get_keys):
+        counts = getattr(self, attribute)
+        if counts is None:
+            counts = Counts(get_keys, self.get_days_in_date_range)
+            for day in self._days:
+                counts.add_day(day)
+            setattr(self, attribute, counts)
+        return counts
+
+    def get_category_counts(self, start_date=None, end_date=None):
+        """
+        Return a read-only dict mapping categories to their number of days
+        between start_date and end_date (None for no limit).
+        """
+        counts = self._get_counts("_category_counts", _get_categories)
+        return counts.get_counts(start_date, end_date)
+
+    def get_word_counts(self, start_date=None, end_date=None):
+        """
+        Return a read-only dict mapping the lower-case words of the days
+        between start_date and end_date (None for no limit) to their
+        number of occurrences.
+        """
+        counts = self._get_counts("_word_counts", _get_lower_case_words)
+        return counts.get_counts(start_date, end_date)
+
+    def _get_text_index(self):
+        if self._text_index is None:
+            self._text_index = TextIndex()
+            for day in self._days:
+                self._text_index.add_day(day)
+        return self._text_index
+
+    def search_days(self, text, tags):
+        """
+        Return the days that have all given tags and may contain text in
+        date order. Day.search() decides whether they actually contain it.
+
+        If the days found by a recent search were passed to
+        remember_search(), searches that refine it only return its days.
+        """
+        if text:
+            dates = self._search_cache.get_dates(text, tags, self.version)
+            if dates is not None:
+                if tags:
+                    dates = dates & self.get_dates_with_tags(tags)
+                return self.get_days(dates)
+        days = self.get_days_with_tags(tags)
+        if not text:
+            return days
+        dates = self._get_text_index().get_candidate_dates(text)
+        if dates is None:
+            return days
+        if not tags:
+            return self.get_days(dates)
+        return [day for day in days if day.date in dates]
+
+    def get_dates_containing(self, text):
+        """Return the dates of the days for which Day.search() finds text."""
+        dates = set()
+        if text and set(text) <= DATE_CHARACTERS:
+            dates = {date for date in self._dates if text in str(date)}
+        parts = casefold(text).split()
+        if not parts:
+            return dates
+        candidates = self._get_text_index().get_token_dates(parts)
+        if parts == [casefold(text)]:
+            # Text without whitespace is found exactly in the days that
+            # have a token containing it.
+            return dates | candidates
+        return dates | {
+            day.date for day in self.get_days(candidates) if day.search(text, [])[1]
+        }
+
+    def rank_days(self, text, days):
+        """
+        Sort the days by their relevance for text, most relevant first.
+        The order of equally relevant days is kept.
+        """
+        scores = self._get_text_index().get_scores(text, [day.date for day in days])
+        return sorted(days, key=lambda day: -scores[day.date])
+
+    def remember_search(self, text, tags, dates):
+        """Store the dates of the days in which Day.search() found text."""
+        if text:
+            self._search_cache.add(text, tags, self.version, dates)
+
+    def fuzzy_search_days(self, text, tags):
+        """
+        Return (day, token) pairs for the days that have all given tags and
+        contain tokens similar to text, most similar first. Day.search()
+        finds the token in the day.
+        """
+        tagged_dates = {day.date for day in self.get_days_with_tags(tags)}
+        return [
+            (self.get_days([date])[0], token)
+            for date, token, _ in self._get_text_index().get_similar_dates(text)
+            if date in tagged_dates
+        ]
+
+    def get_days_with_categories(self, categories):
+        """Return the days that have at least one of the given categories."""
+        dates = set()
+        for category in categories:
+            dates |= self._dates_by_category.get(category, set())
+        return self.get_days(dates)
+
+    def get_days_in_date_range(self, start_date=None, end_date=None):
+        start = 0 if start_date is None else bisect.bisect_left(self._dates, start_date)
+        end = (
+            len(self._dates)
+            if end_date is None
+            else bisect.bisect_right(self._dates, end_date)
+        )
+        return self._days[start:end]
+
+    def find_next(self, date):
+        """Return the first day on or after date or None."""
+        pos = bisect.bisect_left(self._dates, date)
+        return self._days[pos] if pos < len(self._days) else None
+
+    def find_previous(self, date):
+        """Return the last day on or before date or None."""
+        pos = bisect.bisect_right(self._dates, date)
+        return self._days[pos - 1] if pos else None
@@ -0,0 +1,111 @@
+# -----------------------------------------------------------------------
+# Copyright (c) 2009  Jendrik Seipp
+#
+# RedNotebook is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RedNotebook is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with RedNotebook; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# -----------------------------------------------------------------------
+
+"""
+Selection of the words shown in the clouds. This module doesn't use GTK.
+"""
+
+import heapq
+import locale
+import logging
+import re
+
+
+# Patterns without special characters, except for escaped punctuation.
+LITERAL = re.compile(r"(?:[^\\.^$*+?{}\[\]|()]|\\[^\w])*")
+
+
+def get_regex(word):
+    try:
+        return re.compile(f"{word}$", re.I)
+    except Exception:
+        logging.warning(f'"{word}" is not a valid regular expression')
+        return re.compile("^$")
+
+
+class WordFilter:
+    """
+    Match words against regular expressions that must match whole words,
+    ignoring case. Literal patterns are looked up in a set and all other
+    patterns are combined into a single regular expression.
+    """
+
+    def __init__(self, patterns):
+        # Cache the results, because the words rarely change between updates.
+        self._matches = {}
+        self.literals = set()
+        self.regexes = []
+        combinable = []
+        for pattern in patterns:
+            if LITERAL.fullmatch(pattern):
+                self.literals.add(re.sub(r"\\(.)", r"\1", pattern).lower())
+                continue
+            regex = get_regex(pattern)
+            if regex.pattern == "^$":
+                # Invalid pattern.
+                continue
+            if regex.groups:
+                # Group numbers would change in a combined expression.
+                self.regexes.append(regex)
+            else:
+                combinable.append(pattern)
+        if combinable:
+            try:
+                self.regexes.append(
+                    re.compile("|".join(f"(?:{p}$)" for p in combinable), re.I)
+                )
+            except re.error:
+                # Some patterns cannot be combined, e.g. if they set global flags.
+                self.regexes.extend(get_regex(pattern) for pattern in combinable)
+
+    def matches(self, word):
+        try:
+            return self._matches[word]
+        except KeyError:
+            match = self._matches[word] = word.lower() in self.literals or any(
+                regex.match(word) for regex in self.regexes
+            )
+            return match
+
+
+def select_most_frequent_words(words_and_frequencies, count, accept=None):
+    """
+    Return the count most frequent (word, frequency) pairs whose words are
+    accepted by accept(), sorted by word. Words with the same frequency are
+    selected in the given order. Words are only checked until enough words
+    have been found.
+    """
+    if count == 0:
+        return []
+
+    def get_collated_word(word_and_freq):
+        word, freq = word_and_freq
+        return locale.strxfrm(word)
+
+    heap = [
+        (-freq, position, word)
+        for position, (word, freq) in enumerate(words_and_frequencies)
+    ]
+    heapq.heapify(heap)
+    words_and_frequencies = []
+    while heap and len(words_and_frequencies) < count:
+        freq, _, word = heapq.heappop(heap)
+        if accept is None or accept(word):
+            words_and_frequencies.append((word, -freq))
+    words_and_frequencies.sort(key=get_collated_word)
+    return words_and_frequencies
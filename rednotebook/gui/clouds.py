@@ -17,14 +17,16 @@
 # -----------------------------------------------------------------------
 
 from collections import defaultdict
-import locale
+import concurrent.futures
+import hashlib
 import logging
 import re
 
-from gi.repository import GObject, Gtk
+from gi.repository import GLib, GObject, Gtk
 
-from rednotebook import data
+from rednotebook import data, query
 from rednotebook.gui import browser
+from rednotebook.gui.cloud_filter import select_most_frequent_words, WordFilter
 from rednotebook.util import utils
 
 
@@ -51,20 +53,21 @@ CLOUD_CSS = """\
 """
 
 
-def get_regex(word):
-    try:
-        return re.compile(f"{word}$", re.I)
-    except Exception:
-        logging.warning(f'"{word}" is not a valid regular expression')
-        return re.compile("^$")
-
-
 class Cloud(browser.HtmlView):
     def __init__(self, journal):
         super().__init__()
         self.journal = journal
         self.update_lists()
 
+        # The words are selected and the HTML is built in a background thread.
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="Cloud"
+        )
+        # Results of older updates are dropped.
+        self.update_id = 0
+        self.link_dict = []
+        self.html_digest = None
+
         self.connect("context-menu", self._on_context_menu)
         self.connect("decide-policy", self.on_decide_policy)
 
@@ -85,8 +88,8 @@ class Cloud(browser.HtmlView):
 
     def update_regexes(self):
         logging.debug("Start compiling regexes")
-        self.regexes_ignore = [get_regex(word) for word in self.ignore_list]
-        self.regexes_include = [get_regex(word) for word in self.include_list]
+        self.ignore_filter = WordFilter(self.ignore_list)
+        self.include_filter = WordFilter(self.include_list)
         logging.debug("Finished")
 
     def update(self, force_update=False):
@@ -100,34 +103,81 @@ class Cloud(browser.HtmlView):
 
         GObject.idle_add(self._update)
 
-    def get_categories_counter(self):
+    def get_period(self):
+        """Return the (start, end) dates of the days counted for the cloud."""
+        period = str(self.journal.config.read("cloudPeriod"))
+        try:
+            return query.parse_period(period)
+        except query.QueryError as err:
+            logging.warning(f"Counting all days for the cloud: {err}")
+            return None, None
+
+    def get_categories_counter(self, start_date=None, end_date=None):
         counter = defaultdict(int)
-        for day in self.journal.days:
-            for cat in day.categories:
-                counter[f"#{data.escape_tag(cat)}"] += 1
+        index = self.journal.get_day_index()
+        for cat, count in index.get_category_counts(start_date, end_date).items():
+            counter[f"#{data.escape_tag(cat)}"] += count
         return counter
 
     def _update(self):
         logging.debug("Update the cloud")
         self.journal.save_old_day()
 
-        # TODO: Avoid using an instance variable here.
-        self.link_index = 0
-
-        tags_count_dict = list(self.get_categories_counter().items())
-        self.tags = self._get_tags_for_cloud(tags_count_dict, self.regexes_ignore)
-
-        word_count_dict = self.journal.get_word_count_dict()
-        self.words = self._get_words_for_cloud(
-            word_count_dict, self.regexes_ignore, self.regexes_include
+        # The counts are maintained incrementally per day and month, so
+        # merging and copying them is cheap.
+        start_date, end_date = self.get_period()
+        tags_count_dict = list(
+            self.get_categories_counter(start_date, end_date).items()
+        )
+        word_count_dict = dict(self.journal.get_word_count_dict(start_date, end_date))
+        bgcolor, fgcolor = utils.get_gtk_colors(
+            self.journal.frame.day_text_field.day_text_view
+        )
+        style = {
+            "font": self.journal.config.read("previewFont"),
+            "bgcolor": bgcolor,
+            "fgcolor": fgcolor,
+        }
+        self.update_id += 1
+        update_id = self.update_id
+        future = self.executor.submit(
+            self._compute_cloud,
+            tags_count_dict,
+            word_count_dict,
+            self.journal.config.read("cloudMaxTags"),
+            self.ignore_filter,
+            self.include_filter,
+            style,
+        )
+        future.add_done_callback(
+            lambda future: GLib.idle_add(self._on_cloud_computed, future, update_id)
         )
 
-        self.link_dict = self.tags + self.words
-        html = self.get_clouds(self.words, self.tags)
-        self.load_html(html)
-        logging.debug("Cloud updated")
-
-    def _get_cloud_body(self, cloud_words):
+    def _compute_cloud(
+        self, tags_count_dict, word_count_dict, max_tags, ignores, includes, style
+    ):
+        """
+        Return the (word, count) pairs of the links in the cloud and the
+        cloud's HTML. Runs in the background thread.
+        """
+        tags = self._get_tags_for_cloud(tags_count_dict, max_tags, ignores)
+        words = self._get_words_for_cloud(word_count_dict, ignores, includes)
+        return tags + words, self.get_clouds(words, tags, style)
+
+    def _on_cloud_computed(self, future, update_id):
+        if update_id != self.update_id:
+            # A newer update is running.
+            return False
+        self.link_dict, html = future.result()
+        # Reloading the HTML is expensive, so only do it if the cloud changed.
+        digest = hashlib.sha1(html.encode("utf-8")).hexdigest()
+        if digest != self.html_digest:
+            self.html_digest = digest
+            self.load_html(html)
+            logging.debug("Cloud updated")
+        return False
+
+    def _get_cloud_body(self, cloud_words, first_link_index):
         if not cloud_words:
             return ""
         counts = [freq for (word, freq) in cloud_words]
@@ -140,68 +190,42 @@ class Cloud(browser.HtmlView):
         max_font_size = 40
         font_delta = max_font_size - min_font_size
         html_elements = []
-        for word, count in cloud_words:
+        for link_index, (word, count) in enumerate(cloud_words, first_link_index):
             font_factor = (count - min_count) / delta_count
             font_size = int(min_font_size + font_factor * font_delta)
 
             # Add some whitespace to separate words
             html_elements.append(
-                f'<a href="/#search-{self.link_index}"><span '
+                f'<a href="/#search-{link_index}"><span '
                 f'style="font-size:{font_size}px">{word}</span></a>&#160;'
             )
-            self.link_index += 1
         return "\n".join(html_elements)
 
-    @staticmethod
-    def select_most_frequent_words(words_and_frequencies, count):
-        if count == 0:
-            return []
-
-        def get_collated_word(word_and_freq):
-            word, freq = word_and_freq
-            return locale.strxfrm(word)
-
-        def get_frequency(word_and_freq):
-            word, freq = word_and_freq
-            return freq
-
-        words_and_frequencies.sort(key=get_frequency, reverse=True)
-        words_and_frequencies = words_and_frequencies[:count]
-        words_and_frequencies.sort(key=get_collated_word)
-        return words_and_frequencies
-
-    def _get_tags_for_cloud(self, tag_count_dict, ignores):
-        tags_and_frequencies = [
-            (tag, freq)
-            for (tag, freq) in tag_count_dict
-            if not any(pattern.match(tag) for pattern in ignores)
-        ]
-
-        tag_display_limit = self.journal.config.read("cloudMaxTags")
-        return self.select_most_frequent_words(tags_and_frequencies, tag_display_limit)
+    def _get_tags_for_cloud(self, tag_count_dict, tag_display_limit, ignores):
+        return select_most_frequent_words(
+            tag_count_dict, tag_display_limit, lambda tag: not ignores.matches(tag)
+        )
 
     def _get_words_for_cloud(self, word_count_dict, ignores, includes):
-        words_and_frequencies = [
-            (word, freq)
-            for (word, freq) in word_count_dict.items()
-            if (len(word) > 4 or any(pattern.match(word) for pattern in includes))
-            and not
-            # filter words in ignore_list
-            any(pattern.match(word) for pattern in ignores)
-        ]
-        return self.select_most_frequent_words(words_and_frequencies, CLOUD_WORDS)
+        def accept(word):
+            return (len(word) > 4 or includes.matches(word)) and not (
+                # filter words in ignore_list
+                ignores.matches(word)
+            )
 
-    def get_clouds(self, word_counter, tag_counter):
-        tag_cloud = self._get_cloud_body(tag_counter)
-        word_cloud = self._get_cloud_body(word_counter)
-        font = self.journal.config.read("previewFont")
+        return select_most_frequent_words(word_count_dict.items(), CLOUD_WORDS, accept)
+
+    def get_clouds(self, word_counter, tag_counter, style):
+        """
+        Return the HTML of the clouds. style is a dict with the font and
+        the colors for CLOUD_CSS.
+        """
+        tag_cloud = self._get_cloud_body(tag_counter, 0)
+        word_cloud = self._get_cloud_body(word_counter, len(tag_counter))
         heading = "<h1>&#160;%s</h1>"
-        bgcolor, fgcolor = utils.get_gtk_colors(
-            self.journal.frame.day_text_field.day_text_view
-        )
         parts = [
             "<html><head>",
-            CLOUD_CSS % {"font": font, "bgcolor": bgcolor, "fgcolor": fgcolor},
+            CLOUD_CSS % style,
             "</head>",
             "<body>",
         ]
@@ -255,5 +279,5 @@ class Cloud(browser.HtmlView):
         logging.info(f'"{word}" will be hidden from clouds')
         self.ignore_list.append(word)
         self.journal.config.write_list("cloudIgnoreList", self.ignore_list)
-        self.regexes_ignore.append(get_regex(word))
+        self.ignore_filter = WordFilter(self.ignore_list)
         self.update(force_update=True)
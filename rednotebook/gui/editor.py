@@ -125,8 +125,19 @@ class Editor(GObject.GObject):
         end.backward_chars(len(p3))
         self.day_text_buffer.select_range(start, end)
 
-    def highlight(self, text):
+    def highlight(self, text, offsets=None):
+        """
+        Highlight all occurrences of text. If given, offsets are the
+        (start, end) character offsets of the occurrences.
+        """
         self.search_text = text
+        self.highlight_matches(text, offsets)
+
+    def highlight_matches(self, text, offsets=None):
+        """
+        Highlight the occurrences of text without changing the search text,
+        e.g. for days found with similar words.
+        """
         buf = self.day_text_buffer
 
         # Clear previous highlighting
@@ -136,7 +147,7 @@ class Editor(GObject.GObject):
 
         # Highlight matches
         if text:
-            for match_start, match_end in self.iter_search_matches(text):
+            for match_start, match_end in self.iter_matches(text, offsets):
                 buf.apply_tag_by_name("highlighter", match_start, match_end)
 
     search_flags = (
@@ -152,8 +163,33 @@ class Editor(GObject.GObject):
             yield match
             it = match[1]  # Continue searching from after the match
 
-    def scroll_to_text(self, text):
-        for match_start, _ in self.iter_search_matches(text):
+    def get_matches_at_offsets(self, text, offsets):
+        """
+        Return the (start, end) iters at the given offsets or None if the
+        text at the offsets is not text, e.g. because it has been edited.
+        """
+        buf = self.day_text_buffer
+        matches = []
+        for start, end in offsets:
+            match = (buf.get_iter_at_offset(start), buf.get_iter_at_offset(end))
+            if self.get_text(*match).casefold() != text.casefold():
+                return None
+            matches.append(match)
+        return matches
+
+    def iter_matches(self, text, offsets=None):
+        """
+        Yield the (start, end) iters of the occurrences of text. Use the
+        given offsets if they are still valid instead of searching.
+        """
+        matches = self.get_matches_at_offsets(text, offsets) if offsets else None
+        if matches is None:
+            yield from self.iter_search_matches(text)
+        else:
+            yield from matches
+
+    def scroll_to_text(self, text, offsets=None):
+        for match_start, _ in self.iter_matches(text, offsets):
             # It is safer to scroll to a mark than an iter
             mark = self.day_text_buffer.create_mark(
                 "highlight_query", match_start, left_gravity=False
@@ -367,6 +367,8 @@ class ExportAssistant(Assistant):
         return 4 if page == 2 and self.page2.export_selected_text() else page + 1
 
     def run(self):
+        # Exports need all days.
+        self.journal.load_all_months()
         self.page2.refresh_dates()
         self.page3.refresh_categories_list()
         self.show_all()
@@ -453,26 +455,26 @@ class ExportAssistant(Assistant):
             selected_categories = self.exported_categories
             logging.debug(f"Selected Categories for Inclusion: {selected_categories}")
 
+            if self.is_filtered:
+                filtered_days = self.journal.get_day_index().get_days_with_categories(
+                    selected_categories
+                )
+                filtered_dates = {day.date for day in filtered_days}
+                export_days = [day for day in export_days if day.date in filtered_dates]
+
             markup_strings_for_each_day = []
             for day in export_days:
-                include_day = True
-                if self.is_filtered:
-                    category_pairs = day.get_category_content_pairs()
-                    include_day = any(
-                        category in category_pairs for category in selected_categories
-                    )
-                if include_day:
-                    date_format = self.journal.config.read("exportDateFormat")
-                    date_string = dates.format_date(date_format, day.date)
-                    day_markup = markup.get_markup_for_day(
-                        day,
-                        target,
-                        with_text=self.page3.is_text_included(),
-                        with_tags=self.page3.is_tags_included(),
-                        categories=selected_categories,
-                        date=date_string,
-                    )
-                    markup_strings_for_each_day.append(day_markup)
+                date_format = self.journal.config.read("exportDateFormat")
+                date_string = dates.format_date(date_format, day.date)
+                day_markup = markup.get_markup_for_day(
+                    day,
+                    target,
+                    with_text=self.page3.is_text_included(),
+                    with_tags=self.page3.is_tags_included(),
+                    categories=selected_categories,
+                    date=date_string,
+                )
+                markup_strings_for_each_day.append(day_markup)
 
             markup_string = "".join(markup_strings_for_each_day)
 
@@ -761,6 +761,9 @@ class DayEditor(editor.Editor):
         # and cursor position. Once a buffer drops out of this, it needs to be
         # recreated: at this point, the cursor and undo are lost.
         self.recent_buffers = OrderedDict()
+        # Map date strings to the text found in the days (the search text
+        # or a similar word) and its offsets.
+        self.search_offsets = {}
 
     def _get_t2t_highlighting(self):
         if self._t2t_highlighting is None:
@@ -822,8 +825,11 @@ class DayEditor(editor.Editor):
 
         if self.search_text:
             # If a search is currently made, scroll to the text and return.
-            GObject.idle_add(self.scroll_to_text, self.search_text)
-            GObject.idle_add(self.highlight, self.search_text)
+            matched_text, offsets = self.search_offsets.get(
+                str(new_day), (self.search_text, None)
+            )
+            GObject.idle_add(self.scroll_to_text, matched_text, offsets)
+            GObject.idle_add(self.highlight_matches, matched_text, offsets)
             return
 
     def show_template(self, title, text):
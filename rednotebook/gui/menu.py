@@ -306,7 +306,9 @@ class MainMenuBar:
                 _("Please select an empty directory."), title=title, error=True
             )
             return False
-        elif action in ["open"] and not list(storage.get_journal_files(new_dir)):
+        elif (
+            action in ["open"] and not storage.get_backend(new_dir).get_month_catalog()
+        ):
             self.journal.show_message(
                 _("This directory contains no journal files:") + " " + new_dir,
                 title=title,
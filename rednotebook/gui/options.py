@@ -316,6 +316,20 @@ class OptionsManager:
         )
 
         self.options.append(TickOption(_("Search as you type"), "instantSearch"))
+        self.options.append(
+            TickOption(
+                _("Show similar words if nothing is found"),
+                "fuzzySearch",
+                tooltip=_("Tolerate typos when searching"),
+            )
+        )
+        self.options.append(
+            TickOption(
+                _("Sort search results by relevance"),
+                "rankSearchResults",
+                tooltip=_("Show the days that match the search best first"),
+            )
+        )
 
         def check_version_action(widget):
             utils.check_new_version(
@@ -354,6 +368,15 @@ class OptionsManager:
                     "cloudMaxTags",
                     tooltip=_("Maximum number of tags displayed in the cloud"),
                 ),
+                TextOption(
+                    _("Cloud period"),
+                    "cloudPeriod",
+                    tooltip=_(
+                        "Only count the words and tags of these days, e.g. "
+                        '"30 days", "this month", "this year" or "2019..2021". '
+                        "Leave empty to count all days."
+                    ),
+                ),
                 TextOption(
                     _("Exclude from cloud"),
                     "cloudIgnoreList",
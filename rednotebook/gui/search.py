@@ -16,14 +16,22 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 # -----------------------------------------------------------------------
 
+import time
 from xml.sax.saxutils import escape
 
-from gi.repository import GObject
+from gi.repository import GLib, GObject
 
+from rednotebook import query
 from rednotebook.gui.customwidgets import CustomComboBoxEntry, CustomListView
 from rednotebook.util import dates
 
 
+# Milliseconds to wait for the next keystroke before searching.
+SEARCH_DELAY = 150
+# Seconds that adding search results may block the main loop at a time.
+FRAME_BUDGET = 0.01
+
+
 class SearchComboBox(CustomComboBoxEntry):
     def __init__(self, combo_box, main_window):
         CustomComboBoxEntry.__init__(self, combo_box)
@@ -37,13 +45,30 @@ class SearchComboBox(CustomComboBoxEntry):
         self.entry.connect("changed", self.on_entry_changed)
         self.entry.connect("activate", self.on_entry_activated)
 
+        self.pending_search = None
+
     def on_entry_changed(self, entry):
         """Called when the entry changes."""
         search_text = self.get_active_text()
-        if self.journal.config.read("instantSearch"):
-            self.search(search_text)
-        elif not search_text:
+        if not search_text:
             self.search("")
+        elif self.journal.config.read("instantSearch"):
+            self.cancel_pending_search()
+            # Don't keep adding results for the old search text.
+            self.main_window.search_tree_view.stop_adding_results()
+            self.pending_search = GLib.timeout_add(
+                SEARCH_DELAY, self.on_search_delay_passed, search_text
+            )
+
+    def on_search_delay_passed(self, search_text):
+        self.pending_search = None
+        self.search(search_text)
+        return False
+
+    def cancel_pending_search(self):
+        if self.pending_search is not None:
+            GLib.source_remove(self.pending_search)
+            self.pending_search = None
 
     def on_entry_activated(self, entry):
         """Called when the user hits enter."""
@@ -52,6 +77,10 @@ class SearchComboBox(CustomComboBoxEntry):
         self.search(search_text)
 
     def search(self, search_text):
+        self.cancel_pending_search()
+        if query.is_query(search_text):
+            self.search_query(search_text)
+            return
         tags = []
         queries = []
         for part in search_text.split():
@@ -72,7 +101,23 @@ class SearchComboBox(CustomComboBoxEntry):
             )
 
         self.main_window.search_tree_view.update_data(search_text, tags)
-
+        self.keep_focus()
+
+    def search_query(self, search_text):
+        try:
+            parsed_query = query.parse(search_text)
+        except query.QueryError as err:
+            # The query may still be incomplete, so don't show an error dialog.
+            self.journal.show_message(str(err))
+            parsed_query = None
+        terms = parsed_query.get_terms() if parsed_query else []
+        self.main_window.highlight_text(terms[0] if terms else "")
+        self.main_window.search_tree_view.update_data(
+            search_text, [], parsed_query=parsed_query
+        )
+        self.keep_focus()
+
+    def keep_focus(self):
         # Without the following, showing the search results sometimes lets the
         # search entry lose focus and search phrases are added to a day's text.
         if not self.entry.has_focus():
@@ -81,7 +126,9 @@ class SearchComboBox(CustomComboBoxEntry):
 
 class SearchTreeView(CustomListView):
     def __init__(self, main_window, always_show_results):
-        CustomListView.__init__(self, [(_("Date"), str), (_("Text"), str)])
+        CustomListView.__init__(
+            self, [(_("Date"), str), (_("Text"), str), (_("Hits"), str)]
+        )
         self.main_window = main_window
         self.journal = self.main_window.journal
         self.always_show_results = always_show_results
@@ -89,8 +136,17 @@ class SearchTreeView(CustomListView):
 
         self.connect("cursor_changed", self.on_cursor_changed)
 
-    def update_data(self, search_text, tags):
+        self.results = None
+        self.result_adder = None
+
+    def update_data(self, search_text, tags, parsed_query=None):
+        """
+        Show the days found for search_text and tags or, if given, for the
+        parsed query.
+        """
+        self.stop_adding_results()
         self.tree_store.clear()
+        self.main_window.day_text_field.search_offsets.clear()
 
         if not self.always_show_results and not tags and not search_text:
             self.main_window.cloud.show()
@@ -100,11 +156,45 @@ class SearchTreeView(CustomListView):
         self.main_window.cloud.hide()
         self.main_window.search_scroll.show()
 
-        for date_string, entries in self.journal.search(search_text, tags):
+        # Results are added in idle time, so typing is never blocked.
+        if parsed_query is not None:
+            self.results = self.journal.iter_query(parsed_query)
+        elif query.is_query(search_text):
+            # The query is invalid.
+            return
+        else:
+            self.results = self.journal.iter_search(search_text, tags)
+        self.result_adder = GLib.idle_add(self.add_results)
+
+    def add_results(self):
+        """
+        Add results until the frame budget is used up.
+
+        Returns whether the function should be called again.
+        """
+        deadline = time.perf_counter() + FRAME_BUDGET
+        search_offsets = self.main_window.day_text_field.search_offsets
+        for date_string, entries, matched_text, offsets in self.results:
+            search_offsets[date_string] = (matched_text, offsets)
+            # Count the matches in the text instead of the text result.
+            hits = str(len(offsets) + len(entries) - bool(offsets))
             for entry in entries:
                 entry = escape(entry)
                 entry = entry.replace("STARTBOLD", "<b>").replace("ENDBOLD", "</b>")
-                self.tree_store.append([date_string, entry])
+                self.tree_store.append([date_string, entry, hits])
+                # Only show the number of hits in the first row of each day.
+                hits = ""
+            if time.perf_counter() > deadline:
+                return True
+        self.results = None
+        self.result_adder = None
+        return False
+
+    def stop_adding_results(self):
+        if self.result_adder is not None:
+            GLib.source_remove(self.result_adder)
+            self.result_adder = None
+        self.results = None
 
     def on_cursor_changed(self, treeview):
         """Move to the selected day when user clicks on it"""
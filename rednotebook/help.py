@@ -223,6 +223,14 @@ search results lets you jump to it.
 
 You can search for text or dates (e.g. 2014, 2014-01, 2014-01-19).
 
+For more precise searches, combine words, "quoted phrases" and #tags
+with AND, OR, NOT and parentheses. In such queries, words without an
+operator between them must all be found. Restrict the results to a period with
+date:2019..2021, date:2019-03, before:2020 or after:2019-06-15. For
+example:
+
+``("call mom" OR #family) NOT #work date:2019..``
+
 
 == Clouds ==[clouds]
 
@@ -230,6 +238,10 @@ The most frequently used words will appear in the word cloud on the
 left. Its contents are only refreshed when RedNotebook starts and when
 the journal is saved.
 
+By default, the clouds count all days. In the Preferences dialog you can
+restrict them to a period like "30 days", "this month", "this year" or
+"2019..2021".
+
 If a word appears in the cloud that you don't want to see there,
 right-click and select to hide it. Alternatively, you can open the
 Preferences dialog and add the word to the cloud blacklist. Short words
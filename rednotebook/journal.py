@@ -16,9 +16,7 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 # -----------------------------------------------------------------------
 
-from collections import defaultdict
 import datetime
-import itertools
 import locale
 import logging
 import os
@@ -187,6 +185,8 @@ except (ImportError, AssertionError) as e:
 
 from rednotebook.util import dates
 from rednotebook import backup
+from rednotebook import query
+from rednotebook import watcher
 
 from rednotebook.util.statistics import Statistics
 from rednotebook.gui.main_window import MainWindow
@@ -223,6 +223,17 @@ class Journal(Gtk.Application):
         self.month = None
         self.date = None
         self.months = {}
+        self.day_index = data.DayIndex()
+        # Months that have not been loaded yet (see lazyLoading).
+        self.month_catalog = {}
+        # Months that could not be read. They are never saved.
+        self.unreadable_months = set()
+        self.backend = None
+        self.month_loader = None
+        self.month_writer = storage.MonthWriter()
+        # Map futures of background saves to the arguments for on_months_saved.
+        self.pending_saves = {}
+        self.watcher = watcher.JournalWatcher(self)
 
         # The dir name is the title
         self.title = ""
@@ -335,6 +346,8 @@ class Journal(Gtk.Application):
         self.save_to_disk(exit_imminent=True)
 
         if self.is_allowed_to_exit:
+            self.watcher.stop()
+            self.month_writer.shutdown()
             logging.info("Goodbye!")
             # Informs the logging system to perform an orderly shutdown by
             # flushing and closing all handlers.
@@ -355,8 +368,19 @@ class Journal(Gtk.Application):
         )
 
     def save_to_disk(self, exit_imminent=False, changing_journal=False, saveas=False):
+        """
+        Write the edited months to disk in the background.
+
+        When exiting, changing the journal or saving it under a new name, wait
+        until everything has been written.
+        """
         self.save_old_day()
 
+        wait = exit_imminent or changing_journal or saveas
+        if wait:
+            # Months from failed background saves have to be saved again.
+            self.finish_pending_saves()
+
         try:
             filesystem.make_directory(self.dirs.data_dir)
         except OSError as err:
@@ -364,20 +388,74 @@ class Journal(Gtk.Application):
             self.frame.show_save_error_dialog(exit_imminent)
             return True
 
-        try:
-            something_saved = storage.save_months_to_disk(
-                self.months, self.dirs.data_dir, exit_imminent, saveas
+        if saveas:
+            self.load_all_months()
+            # Save As exports the journal to the default (YAML) format.
+            self.backend = storage.get_backend(
+                self.dirs.data_dir, self.dirs.change_log_dir, self.dirs.cache_dir
             )
-        except OSError as err:
-            logging.error(f"Saving month files failed: {err}")
+
+        snapshots = storage.get_month_snapshots(self.months, saveas)
+        future = self.month_writer.submit(
+            snapshots,
+            self.backend,
+            fast_validation=self.config.read("fastSaveValidation"),
+        )
+        self.pending_saves[future] = (
+            snapshots,
+            self.backend.journal_dir,
+            exit_imminent,
+            changing_journal,
+        )
+        if wait:
+            self.on_months_saved(future)
+        else:
+            future.add_done_callback(
+                lambda future: GLib.idle_add(self.on_months_saved, future)
+            )
+
+        # tell gobject to keep saving the content in regular intervals
+        return True
+
+    def finish_pending_saves(self):
+        """Wait for all background saves and handle their results."""
+        for future in list(self.pending_saves):
+            self.on_months_saved(future)
+
+    def on_months_saved(self, future):
+        """Handle the result of a save in the main thread."""
+        if future not in self.pending_saves:
+            # The result has already been handled by finish_pending_saves().
+            return False
+        snapshots, data_dir, exit_imminent, changing_journal = self.pending_saves.pop(
+            future
+        )
+
+        try:
+            stored, error = future.result()
+        except Exception as err:
+            stored, error = [], err
+        for month, mtime in stored:
+            if mtime is not None:
+                month.mtime = mtime
+
+        if error:
+            logging.error(f"Saving month files failed: {error}")
+            # The snapshots marked the months as saved.
+            stored_months = {month for month, _ in stored}
+            for month, _, _, _ in snapshots:
+                if month not in stored_months:
+                    month.edited = True
             self.frame.show_save_error_dialog(exit_imminent)
             something_saved = None
+        else:
+            something_saved = any(mtime is not None for _, mtime in stored)
 
         if something_saved:
             self.show_message(
-                _("The content has been saved to %s") % self.dirs.data_dir, error=False
+                _("The content has been saved to %s") % data_dir, error=False
             )
-            logging.info("The content has been saved to %r" % self.dirs.data_dir)
+            logging.info("The content has been saved to %r" % data_dir)
         elif something_saved is None:
             # Don't display this as an error, because we already show a dialog.
             self.show_message(_("The journal could not be saved"), error=False)
@@ -392,8 +470,8 @@ class Journal(Gtk.Application):
             for tag in self.get_escaped_tags():
                 self.frame.search_box.add_entry(tag)
 
-        # tell gobject to keep saving the content in regular intervals
-        return True
+        # Don't call this function again when it runs as an idle callback.
+        return False
 
     def open_journal(self, data_dir):
         if not os.path.exists(data_dir):
@@ -402,6 +480,7 @@ class Journal(Gtk.Application):
             )
             return
 
+        self.watcher.stop()
         if self.months:
             self.save_to_disk(changing_journal=True)
 
@@ -413,7 +492,25 @@ class Journal(Gtk.Application):
         self.frame.search_box.clear()
         self.frame.day_text_field.clear_buffers()
 
-        self.months = storage.load_all_months_from_disk(data_dir)
+        if self.month_loader is not None:
+            GLib.source_remove(self.month_loader)
+            self.month_loader = None
+
+        self.backend = storage.get_backend(
+            data_dir, self.dirs.change_log_dir, self.dirs.cache_dir
+        )
+        self.months = {}
+        self.month_catalog = self.backend.get_month_catalog()
+        self.unreadable_months = set()
+        errors = self.backend.replay_change_log(self.months, self.month_catalog)
+        for year_and_month, err in errors.items():
+            self.on_month_unreadable(year_and_month, err)
+        self.day_index = data.DayIndex()
+        for month in self.months.values():
+            self.day_index.add_month(month)
+        # Otherwise only parse the months we need now and the rest in idle time.
+        if not self.config.read("lazyLoading"):
+            self.load_all_months()
 
         # Nothing to save before first day change
         self.load_day(self.actual_date)
@@ -423,10 +520,13 @@ class Journal(Gtk.Application):
 
         self.stats = Statistics(self)
 
-        self.frame.cloud.update(force_update=True)
+        if self.month_catalog:
+            self.month_loader = GLib.idle_add(self.load_next_month)
+        else:
+            self.on_all_months_loaded()
 
-        self.frame.categories_tree_view.categories = self.categories
-        self.frame.search_box.set_entries(self.get_escaped_tags())
+        if self.config.read("watchJournal"):
+            self.watcher.watch(data_dir)
 
         self.title = filesystem.get_journal_title(data_dir)
 
@@ -440,6 +540,90 @@ class Journal(Gtk.Application):
             rel_data_dir = filesystem.get_relative_path(self.dirs.app_dir, data_dir)
             self.config["dataDir"] = rel_data_dir
 
+    def on_all_months_loaded(self):
+        """Initialize the widgets that need to know about all days."""
+        self.frame.cloud.update(force_update=True)
+
+        self.frame.categories_tree_view.categories = self.categories
+        self.frame.search_box.set_entries(self.get_escaped_tags())
+
+        # Searches only looked at the months loaded at the time.
+        search_text = self.frame.search_box.get_active_text()
+        if search_text:
+            self.frame.search_box.search(search_text)
+
+    def load_next_month(self):
+        """
+        Load one remaining month (newest first) in idle time.
+
+        Returns whether the function should be called again.
+        """
+        if self.month_catalog:
+            self.load_month(max(self.month_catalog))
+        if self.month_catalog:
+            return True
+        logging.debug("Finished loading all months")
+        self.backend.finish_loading()
+        self.month_loader = None
+        self.on_all_months_loaded()
+        return False
+
+    def load_all_months(self):
+        """
+        Load all months that have not been loaded yet. Only call this for
+        actions that need all days, e.g. exports, because it blocks the
+        main loop.
+        """
+        if not self.month_catalog:
+            return
+        for year_and_month in list(self.month_catalog):
+            self.load_month(year_and_month)
+        self.backend.finish_loading()
+
+    def load_month(self, year_and_month):
+        """Load the month from the catalog and add it if it can be read."""
+        try:
+            month = self.backend.load_month(self.month_catalog, year_and_month)
+        except (OSError, ValueError) as err:
+            self.on_month_unreadable(year_and_month, err)
+        else:
+            self.add_month(year_and_month, month)
+
+    def on_month_unreadable(self, year_and_month, err):
+        """
+        Keep the month read-only, since saving it would overwrite the
+        possibly corrupted file.
+        """
+        self.unreadable_months.add(year_and_month)
+        self.show_message(
+            _("The month %s could not be loaded and is read-only.") % year_and_month
+            + f"\n\n{err}",
+            error=True,
+        )
+
+    def add_month(self, year_and_month, month):
+        """Add a loaded month, replacing an older version of it."""
+        old_month = self.months.get(year_and_month)
+        if old_month is not None:
+            self.day_index.remove_month(old_month)
+        self.months[year_and_month] = month
+        self.day_index.add_month(month)
+
+    def replace_month(self, year_and_month, month):
+        """Replace a loaded month, e.g. after another program changed it."""
+        self.unreadable_months.discard(year_and_month)
+        self.add_month(year_and_month, month)
+        if self.month is not None and year_and_month == (
+            dates.get_year_and_month_from_date(self.date)
+        ):
+            self.month = month
+            # The recent buffers still contain the old text.
+            self.frame.day_text_field.clear_buffers()
+            self.frame.set_date(self.month, self.date, self.day)
+            self.set_day_editable()
+        if self.month_loader is None:
+            self.on_all_months_loaded()
+
     def set_frame_title(self):
         parts = ["RedNotebook"]
         if self.title != "data":
@@ -450,14 +634,22 @@ class Journal(Gtk.Application):
     def get_month(self, date):
         """
         Returns the corresponding month if it has previously been visited,
-        otherwise a new month is created and returned
+        otherwise it is loaded from disk or a new month is created and returned
+
+        Unreadable months are returned as empty months that are never saved.
         """
 
         year_and_month = dates.get_year_and_month_from_date(date)
 
+        if year_and_month in self.month_catalog:
+            self.load_month(year_and_month)
+
+        if year_and_month in self.unreadable_months:
+            return Month(date.year, date.month)
+
         # Selected month has not been loaded or created yet
         if year_and_month not in self.months:
-            self.months[year_and_month] = Month(date.year, date.month)
+            self.add_month(year_and_month, Month(date.year, date.month))
 
         return self.months[year_and_month]
 
@@ -469,14 +661,16 @@ class Journal(Gtk.Application):
 
     def save_old_day(self):
         """Order is important"""
-        old_content = self.day.content
+        if self.is_read_only():
+            return
+        old_version = self.day.version
         new_content = self.frame.categories_tree_view.get_day_content()
         new_content["text"] = self.frame.get_day_text()
         self.day.content = new_content
 
-        content_changed = old_content != new_content
-        if content_changed:
-            self.month.edited = True
+        if self.day.version != old_version:
+            # Make the change durable before the month file is written.
+            self.month_writer.log_day(self.day, self.backend)
 
         self.frame.calendar.set_day_edited(self.date.day, not self.day.empty)
 
@@ -488,9 +682,16 @@ class Journal(Gtk.Application):
             self.month = self.get_month(self.date)
 
         self.frame.set_date(self.month, self.date, self.day)
+        self.set_day_editable()
 
         self.set_frame_title()
 
+    def is_read_only(self):
+        return dates.get_year_and_month_from_date(self.date) in self.unreadable_months
+
+    def set_day_editable(self):
+        self.frame.day_text_field.day_text_view.set_editable(not self.is_read_only())
+
     @property
     def day(self):
         return self.month.get_day(self.date.day)
@@ -508,18 +709,47 @@ class Journal(Gtk.Application):
         self.save_old_day()
         self.load_day(new_date)
 
+    def find_edited_day(self, date, forward):
+        """
+        Return the first non-empty day on or after date (forward) or the
+        last one on or before date or None. Only the unloaded months
+        between date and the closest loaded day are loaded.
+        """
+        index = self.get_day_index()
+        year_and_month = dates.get_year_and_month_from_date(date)
+        while True:
+            day = index.find_next(date) if forward else index.find_previous(date)
+            day_month = day and dates.get_year_and_month_from_date(day.date)
+            if forward:
+                months = [
+                    key
+                    for key in self.month_catalog
+                    if year_and_month <= key and (day is None or key <= day_month)
+                ]
+                closest_month = min(months, default=None)
+            else:
+                months = [
+                    key
+                    for key in self.month_catalog
+                    if key <= year_and_month and (day is None or day_month <= key)
+                ]
+                closest_month = max(months, default=None)
+            if closest_month is None:
+                return day
+            self.load_month(closest_month)
+
     def go_to_next_day(self):
         next_date = self.date + dates.one_day
-        following_edited_days = self.get_days_in_date_range(start_date=next_date)
-        if following_edited_days:
-            next_date = following_edited_days[0].date
+        next_edited_day = self.find_edited_day(next_date, forward=True)
+        if next_edited_day:
+            next_date = next_edited_day.date
         self.change_date(next_date)
 
     def go_to_prev_day(self):
         prev_date = self.date - dates.one_day
-        previous_edited_days = self.get_days_in_date_range(end_date=prev_date)
-        if previous_edited_days:
-            prev_date = previous_edited_days[-1].date
+        prev_edited_day = self.find_edited_day(prev_date, forward=False)
+        if prev_edited_day:
+            prev_date = prev_edited_day.date
         self.change_date(prev_date)
 
     def show_message(self, msg, title=None, error=False):
@@ -538,81 +768,94 @@ class Journal(Gtk.Application):
 
     @property
     def categories(self):
-        return sorted(
-            set(itertools.chain.from_iterable(day.categories for day in self.days)),
-            key=locale.strxfrm,
-        )
+        return sorted(self.get_day_index().categories, key=locale.strxfrm)
 
     def get_entries(self, category):
         entries = set()
-        for day in self.days:
+        for day in self.get_day_index().get_days_with_categories([category]):
             entries |= set(day.get_entries(category))
         return sorted(entries)
 
-    def search(self, text, tags):
-        results = []
-        for day in reversed(self.get_days_with_tags(tags)):
-            results.append(day.search(text, tags))
-        return results
+    def iter_search(self, text, tags):
+        """
+        Yield (date string, results, matched text, offsets) tuples for the
+        days with the given tags that may contain text, newest first or, if
+        the "rankSearchResults" option is set, most relevant first. The
+        offsets are the (start, end) pairs of all occurrences of the matched
+        text in the day. The matched text is the search text, except for
+        fuzzy matches.
+        """
+        index = self.get_day_index()
+        version = index.version
+        found_dates = set()
+        days = index.search_days(text, tags)[::-1]
+        if text and self.config.read("rankSearchResults"):
+            days = index.rank_days(text, days)
+        for day in days:
+            date_string, entries = day.search(text, tags)
+            if entries:
+                found_dates.add(day.date)
+            offsets = day.get_match_offsets(text) if entries else []
+            yield date_string, entries, text, offsets
+        found = bool(found_dates)
+        if index.version == version:
+            # Let refined searches (e.g. while typing) only look at these days.
+            index.remember_search(text, tags, found_dates)
+        if text and not found and self.config.read("fuzzySearch"):
+            # Show the days containing words similar to the search text.
+            for day, token in index.fuzzy_search_days(text, tags):
+                date_string, entries = day.search(token, tags)
+                yield date_string, entries, token, day.get_match_offsets(token)
+
+    def iter_query(self, parsed_query):
+        """
+        Yield (date string, results, matched text, offsets) tuples for the
+        days matching a parsed search query (see iter_search()). The offsets
+        belong to the first term of the query.
+        """
+        terms = parsed_query.get_terms()
+        results = query.search(
+            self.get_day_index(),
+            parsed_query,
+            rank=bool(self.config.read("rankSearchResults")),
+        )
+        for date_string, entries, offsets in results:
+            yield date_string, entries, terms[0] if terms else "", offsets
 
     def get_days_with_tags(self, tags):
-        if not tags:
-            return self.days
-        days = []
-        for day in self.days:
-            day_tags = {data.escape_tag(tag) for tag in day.categories}
-            if all(tag in day_tags for tag in tags):
-                days.append(day)
-        return days
-
-    def get_word_count_dict(self):
+        return self.get_day_index().get_days_with_tags(tags)
+
+    def get_word_count_dict(self, start_date=None, end_date=None):
         """
-        Return a dictionary mapping the words to their number of appearance.
+        Return a read-only dictionary mapping the words of the days between
+        start_date and end_date (None for no limit) to their number of
+        appearance.
         """
-        word_dict = defaultdict(int)
-        for day in self.days:
-            words = day.get_words()
-            for word in words:
-                word_dict[word.lower()] += 1
-        return word_dict
+        return self.get_day_index().get_word_counts(start_date, end_date)
 
-    @property
-    def days(self):
+    def get_day_index(self):
         """
-        Returns all edited days ordered by their date
+        Return the index of the non-empty days of the loaded months. While
+        months are loaded in idle time, on_all_months_loaded() updates the
+        widgets that use the index afterwards.
         """
         # The day being edited counts too
         if self.frame:
             self.save_old_day()
 
-        days = []
-        for month in self.months.values():
-            # Filter out days without content.
-            days_in_month = [day for day in month.days.values() if not day.empty]
-            days.extend(days_in_month)
+        return self.day_index
 
-        # Sort days
-        days = sorted(days, key=lambda day: day.date)
-        return days
+    @property
+    def days(self):
+        """
+        Returns all edited days of the loaded months ordered by their date
+        """
+        return self.get_day_index().days
 
     def get_days_in_date_range(self, start_date=None, end_date=None):
-        if not start_date:
-            start_date = datetime.date.min
-        if not end_date:
-            end_date = datetime.date.max
-
-        start_date, end_date = sorted([start_date, end_date])
-        assert start_date <= end_date
-
-        days_in_date_range = []
-        for day in self.days:
-            if day.date < start_date:
-                continue
-            elif start_date <= day.date <= end_date:
-                days_in_date_range.append(day)
-            elif day.date > end_date:
-                break
-        return days_in_date_range
+        if start_date and end_date:
+            start_date, end_date = sorted([start_date, end_date])
+        return self.get_day_index().get_days_in_date_range(start_date, end_date)
 
     def add_instruction_content(self):
         self.change_date(datetime.date.today())
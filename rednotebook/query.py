@@ -0,0 +1,283 @@
+# -----------------------------------------------------------------------
+# Copyright (c) 2009  Jendrik Seipp
+#
+# RedNotebook is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RedNotebook is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with RedNotebook; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# -----------------------------------------------------------------------
+
+"""
+Search queries combining words, "quoted phrases", #tags and date filters
+with AND, OR, NOT and parentheses, e.g.
+
+    "call mom" OR #family NOT #work date:2019..2021
+
+Neighbouring terms are combined with AND. Date filters accept years,
+months and days (2019, 2019-03, 2019-03-14): date:2019, date:2019..2021,
+date:2019-03.. , before:2020 and after:2019-06.
+
+Queries are evaluated as set operations on the dates of a DayIndex.
+"""
+
+import datetime
+import re
+
+from rednotebook.data import escape_tag, get_text_with_dots, TEXT_RESULT_LENGTH
+from rednotebook.util import dates
+
+
+KEYWORDS = {"AND", "OR", "NOT"}
+FILTERS = ("date:", "before:", "after:")
+# A phrase may lack its closing quote while the user is still typing.
+TOKEN = re.compile(r'"([^"]*)"?|([()])|([^\s()"]+)')
+DATE = re.compile(r"(\d{4})(?:-(\d{1,2})(?:-(\d{1,2}))?)?$")
+RECENT_DAYS = re.compile(r"(?:last )?(\d+) days?$")
+
+
+class QueryError(ValueError):
+    pass
+
+
+class Term:
+    def __init__(self, text):
+        self.text = text
+
+    def get_dates(self, index):
+        return index.get_dates_containing(self.text)
+
+    def get_terms(self):
+        return [self.text]
+
+
+class Tag:
+    def __init__(self, tag):
+        self.tag = escape_tag(tag)
+
+    def get_dates(self, index):
+        return index.get_dates_with_tags([self.tag])
+
+    def get_terms(self):
+        return []
+
+
+class DateRange:
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+    def get_dates(self, index):
+        return {day.date for day in index.get_days_in_date_range(self.start, self.end)}
+
+    def get_terms(self):
+        return []
+
+
+class Not:
+    def __init__(self, query):
+        self.query = query
+
+    def get_dates(self, index):
+        return set(index.dates) - self.query.get_dates(index)
+
+    def get_terms(self):
+        # Excluded terms are never shown in the results.
+        return []
+
+
+class And:
+    def __init__(self, queries):
+        self.queries = queries
+
+    def get_dates(self, index):
+        result = None
+        for query in self.queries:
+            dates = query.get_dates(index)
+            result = dates if result is None else result & dates
+            if not result:
+                break
+        return result
+
+    def get_terms(self):
+        return [term for query in self.queries for term in query.get_terms()]
+
+
+class Or(And):
+    def get_dates(self, index):
+        return set().union(*(query.get_dates(index) for query in self.queries))
+
+
+def is_query(text):
+    """
+    Return whether text uses the query syntax. Other search texts are
+    searched for as a whole.
+    """
+    return '"' in text or any(
+        part in KEYWORDS or part.startswith(FILTERS) for part in text.split()
+    )
+
+
+def _parse_period(value):
+    """Return the first and last date of a year, month or day."""
+    match = DATE.match(value)
+    if not match:
+        raise QueryError(_("Invalid date: %s") % value)
+    year, month, day = (int(number) if number else None for number in match.groups())
+    try:
+        if month is None:
+            return datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+        if day is None:
+            last_day = dates.get_number_of_days(year, month)
+            return datetime.date(year, month, 1), datetime.date(year, month, last_day)
+        date = datetime.date(year, month, day)
+    except (IndexError, ValueError):
+        raise QueryError(_("Invalid date: %s") % value)
+    return date, date
+
+
+def _parse_filter(word):
+    name, value = word.split(":", 1)
+    try:
+        if name == "before":
+            return DateRange(None, _parse_period(value)[0] - dates.one_day)
+        if name == "after":
+            return DateRange(_parse_period(value)[1] + dates.one_day, None)
+    except OverflowError:
+        raise QueryError(_("Invalid date: %s") % value)
+    start, sep, end = value.partition("..")
+    if not sep:
+        return DateRange(*_parse_period(value))
+    if not start and not end:
+        raise QueryError(_("Invalid date: %s") % value)
+    return DateRange(
+        _parse_period(start)[0] if start else None,
+        _parse_period(end)[1] if end else None,
+    )
+
+
+def parse_period(text, today=None):
+    """
+    Return the (start, end) dates of a period like "30 days", "this month",
+    "this year" or a range in the syntax of date: filters like 2019..2021.
+    Dates are None for no limit, e.g. for an empty text or "all". Raises
+    QueryError for invalid periods.
+    """
+    text = " ".join(text.lower().split())
+    today = today or datetime.date.today()
+    if text in ("", "all"):
+        return None, None
+    if text == "this month":
+        return today.replace(day=1), today
+    if text == "this year":
+        return today.replace(month=1, day=1), today
+    match = RECENT_DAYS.match(text)
+    if match:
+        days = int(match.group(1))
+        if not 0 < days <= today.toordinal():
+            raise QueryError(_("Invalid period: %s") % text)
+        return today - datetime.timedelta(days=days - 1), today
+    date_range = _parse_filter(f"date:{text}")
+    return date_range.start, date_range.end
+
+
+class _Parser:
+    """
+    Recursive descent parser for the grammar
+
+        or  := and ("OR" and)*
+        and := not ("AND"? not)*
+        not := "NOT" not | "(" or ")" | phrase | #tag | filter | word
+    """
+
+    def __init__(self, text):
+        self.tokens = []
+        for phrase, paren, word in TOKEN.findall(text):
+            if paren:
+                self.tokens.append(paren)
+            elif word:
+                self.tokens.append(word)
+            elif phrase.strip():
+                self.tokens.append(Term(phrase))
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        query = self.parse_or()
+        if self.peek() is not None:
+            raise QueryError(_("Unexpected %s") % self.peek())
+        return query
+
+    def parse_or(self):
+        queries = [self.parse_and()]
+        while self.peek() == "OR":
+            self.next()
+            queries.append(self.parse_and())
+        return queries[0] if len(queries) == 1 else Or(queries)
+
+    def parse_and(self):
+        queries = [self.parse_not()]
+        while self.peek() not in (None, ")", "OR"):
+            if self.peek() == "AND":
+                self.next()
+            queries.append(self.parse_not())
+        return queries[0] if len(queries) == 1 else And(queries)
+
+    def parse_not(self):
+        token = self.next()
+        if token is None or token in (")", "AND", "OR"):
+            raise QueryError(_("Incomplete search query"))
+        if isinstance(token, Term):
+            return token
+        if token == "NOT":
+            return Not(self.parse_not())
+        if token == "(":
+            query = self.parse_or()
+            if self.next() != ")":
+                raise QueryError(_("Missing closing parenthesis"))
+            return query
+        if token.startswith("#") and len(token) > 1:
+            return Tag(token[1:])
+        if token.startswith(FILTERS):
+            return _parse_filter(token)
+        return Term(token)
+
+
+def parse(text):
+    """Parse a search query. Raises QueryError for invalid queries."""
+    return _Parser(text).parse()
+
+
+def search(index, query, rank=False):
+    """
+    Yield (date string, results, offsets) triples for the days of the
+    DayIndex that match the parsed query, newest first or, if rank is
+    True, most relevant first. The offsets belong to the first term.
+    """
+    terms = query.get_terms()
+    days = index.get_days(query.get_dates(index))[::-1]
+    if rank and terms:
+        days = index.rank_days(" ".join(terms), days)
+    for day in days:
+        results = []
+        for term in terms:
+            results.extend(day.search(term, [])[1])
+        if not results:
+            results.append(get_text_with_dots(day.text, 0, TEXT_RESULT_LENGTH))
+        offsets = day.get_match_offsets(terms[0]) if terms else []
+        yield str(day), list(dict.fromkeys(results)), offsets
@@ -16,15 +16,22 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 # -----------------------------------------------------------------------
 
-import codecs
+import concurrent.futures
+import contextlib
+import copy
+import datetime
+import hashlib
+import json
 import logging
+import marshal
 import os
 import re
 import shutil
+import sqlite3
 import stat
 import sys
 
-from rednotebook.data import Month
+from rednotebook.data import escape_tag, Month
 
 
 try:
@@ -44,68 +51,265 @@ except ImportError:
     logging.info("Using PyYAML")
 
 
+# Format: 2010-05.txt
+MONTH_FILENAME = re.compile(r"(\d{4})-(\d{2})\.txt$")
+
+
 def format_year_and_month(year, month):
     return "%04d-%02d" % (year, month)
 
 
 def get_journal_files(data_dir):
-    # Format: 2010-05.txt
-    date_exp = re.compile(r"(\d{4})-(\d{2})\.txt$")
+    """
+    Yield (path, year, month, mtime) tuples for all month files in data_dir.
 
+    The files are not opened, so this is cheap even for large journals.
+    """
     for file in sorted(os.listdir(data_dir)):
-        if match := date_exp.match(file):
+        if match := MONTH_FILENAME.match(file):
             year = int(match[1])
             month = int(match[2])
             assert month in range(1, 12 + 1)
             path = os.path.join(data_dir, file)
-            yield (path, year, month)
+            yield (path, year, month, os.path.getmtime(path))
         else:
             logging.debug(f"{file} is not a valid month filename")
 
 
-def _load_month_from_disk(path, year_number, month_number):
+def get_month_catalog(data_dir):
     """
-    Load the month file at path and return a month object
+    Return a dict mapping year-month values to the entries yielded by
+    get_journal_files() without parsing any month file.
+    """
+    catalog = {}
+    for entry in get_journal_files(data_dir):
+        _, year_number, month_number, _ = entry
+        catalog[format_year_and_month(year_number, month_number)] = entry
+    return catalog
+
 
-    If an error occurs, return None
+def load_month_from_catalog(catalog, year_and_month, cache=None):
     """
-    try:
-        # Try to read the contents of the file.
-        with codecs.open(path, "rb", encoding="utf-8") as month_file:
-            logging.debug(f'Loading file "{path}"')
-            month_contents = yaml.load(month_file, Loader=Loader)
-            return Month(
-                year_number,
-                month_number,
-                month_contents,
-                os.path.getmtime(path),
-            )
-    except yaml.YAMLError as exc:
-        logging.error(f"Error in file {path}:\n{exc}")
-    except OSError:
-        # If that fails, there is nothing to load, so just display an error message.
-        logging.error(f"Error: The file {path} could not be read")
-    except Exception:
-        logging.error(f"An error occurred while reading {path}:")
-        raise
-    # If we continued here, the possibly corrupted file would be overwritten.
-    sys.exit(1)
+    Remove the month from the catalog, parse its file and return it.
+    """
+    path, year_number, month_number, _ = catalog.pop(year_and_month)
+    return _load_month_from_disk(path, year_number, month_number, cache)
 
 
-def load_all_months_from_disk(data_dir):
+# Caches are stored outside of the journal directory, since sync tools would
+# copy them to other machines, where the mtimes of the files differ.
+# RedNotebook uses the "cache" directory in its user directory.
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".rednotebook", "cache")
+# Marshal data is only guaranteed to be readable by the Python version that
+# wrote it. Increase the first number when the layout of the cache changes.
+CACHE_FORMAT = (1, marshal.version, tuple(sys.version_info[:2]))
+
+
+def _get_journal_filename(journal_dir, extension):
+    """Return a filename for data about the journal, e.g. its cache."""
+    journal_path = os.path.realpath(journal_dir).encode("utf-8", "surrogateescape")
+    return hashlib.sha1(journal_path).hexdigest() + extension
+
+
+class MonthCache:
     """
-    Load all months and return a directory mapping year-month values
-    to month objects.
+    File in cache_dir that stores the parsed contents of the month files of
+    a journal. It is named after the path of the journal. Entries are keyed
+    on the file's mtime, size and content hash. A missing, outdated or
+    corrupt cache is rebuilt.
     """
-    months = {}
 
-    logging.debug(f'Starting to load files in dir "{data_dir}"')
-    for path, year_number, month_number in get_journal_files(data_dir):
-        if month := _load_month_from_disk(path, year_number, month_number):
-            months[format_year_and_month(year_number, month_number)] = month
+    def __init__(self, journal_dir, cache_dir=None):
+        cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.path = os.path.join(
+            cache_dir, _get_journal_filename(journal_dir, ".cache")
+        )
+        self.old_entries = self._read()
+        # Only entries used in this session are written back to disk.
+        self.entries = {}
+
+    def _read(self):
+        try:
+            with open(self.path, "rb") as f:
+                cache_format, entries = marshal.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, EOFError, ValueError, TypeError) as err:
+            logging.warning(f"Ignoring corrupt journal cache {self.path}: {err}")
+            return {}
+        if cache_format != CACHE_FORMAT or not isinstance(entries, dict):
+            logging.info(f"Ignoring journal cache {self.path} with old format")
+            return {}
+        return entries
+
+    def get(self, path, key):
+        """Return the cached contents for path or None."""
+        name = os.path.basename(path)
+        entry = self.entries.get(name) or self.old_entries.get(name)
+        if entry is None or entry[0] != key:
+            return None
+        self.entries[name] = entry
+        # Return a fresh object, since days modify their content in place.
+        return marshal.loads(entry[1])
+
+    def set(self, path, key, month_contents):
+        try:
+            self.entries[os.path.basename(path)] = (key, marshal.dumps(month_contents))
+        except ValueError:
+            # YAML may produce objects that marshal cannot store (e.g. dates).
+            logging.debug(f"Cannot cache contents of {path}")
+
+    def save(self):
+        if self.entries == self.old_entries:
+            return
+        new = f"{self.path}.new"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(new, "wb") as f:
+                marshal.dump((CACHE_FORMAT, self.entries), f)
+            os.replace(new, self.path)
+        except OSError as err:
+            logging.warning(f"Journal cache could not be written: {err}")
+        else:
+            self.old_entries = dict(self.entries)
 
-    logging.debug(f'Finished loading files in dir "{data_dir}"')
-    return months
+
+# Change logs are stored outside of the journal directory, since sync tools
+# would copy them to other machines. RedNotebook uses the "changes" directory
+# in its user directory.
+DEFAULT_CHANGE_LOG_DIR = os.path.join(
+    os.path.expanduser("~"), ".rednotebook", "changes"
+)
+
+
+class ChangeLog:
+    """
+    Append-only log of day contents that have not been written to the month
+    files yet. Each line holds one JSON record. The records of a month are
+    removed once the month file has been written. Records that are still in
+    the log at startup are replayed.
+
+    Each journal has its own log file in log_dir, which is named after the
+    path of the journal. The records store the mtime of the month file that
+    the change was based on.
+    """
+
+    def __init__(self, journal_dir, log_dir=None):
+        log_dir = log_dir or DEFAULT_CHANGE_LOG_DIR
+        self.path = os.path.join(log_dir, _get_journal_filename(journal_dir, ".log"))
+
+    @staticmethod
+    def format_record(date, content, mtime):
+        record = {"date": date.isoformat(), "mtime": mtime, "content": content}
+        return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+    def append(self, record):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as err:
+            logging.warning(f"Change could not be written to {self.path}: {err}")
+
+    def _read_lines(self):
+        try:
+            with open(self.path, encoding="utf-8", errors="replace") as f:
+                return f.readlines()
+        except FileNotFoundError:
+            return []
+
+    def _parse_record(self, line):
+        try:
+            record = json.loads(line)
+            date = datetime.date.fromisoformat(record["date"])
+            mtime = record["mtime"]
+            content = record["content"]
+            if isinstance(content, dict) and "text" in content:
+                return date, content, mtime
+        except (ValueError, KeyError, TypeError):
+            pass
+        # The last line may be incomplete after a crash.
+        logging.warning(f"Skipping invalid line in {self.path}: {line!r}")
+        return None
+
+    def read(self):
+        """
+        Return the logged (date, content, mtime) triples in the order of
+        the log.
+        """
+        return [
+            record
+            for record in map(self._parse_record, self._read_lines())
+            if record is not None
+        ]
+
+    def compact(self, saved_year_and_months):
+        """Remove the records of months that have been written to disk."""
+        if not saved_year_and_months or not os.path.exists(self.path):
+            return
+        remaining = []
+        for line in self._read_lines():
+            record = self._parse_record(line)
+            if record is None:
+                continue
+            date = record[0]
+            if (
+                format_year_and_month(date.year, date.month)
+                not in saved_year_and_months
+            ):
+                remaining.append(line)
+        try:
+            if remaining:
+                new = f"{self.path}.new"
+                with open(new, "w", encoding="utf-8") as f:
+                    f.writelines(remaining)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(new, self.path)
+            else:
+                os.remove(self.path)
+        except OSError as err:
+            logging.warning(f"Compacting {self.path} failed: {err}")
+
+
+def _read_month_file(path):
+    """Return the contents, mtime and cache key of the month file at path."""
+    with open(path, "rb") as month_file:
+        logging.debug(f'Loading file "{path}"')
+        data = month_file.read()
+        stat_result = os.fstat(month_file.fileno())
+    digest = hashlib.sha1(data).hexdigest()
+    key = (stat_result.st_mtime_ns, stat_result.st_size, digest)
+    return data, stat_result.st_mtime, key
+
+
+def _parse_month_data(data):
+    return yaml.load(data.decode("utf-8"), Loader=Loader)
+
+
+def _load_month_from_disk(path, year_number, month_number, cache=None):
+    """
+    Load the month file at path and return a month object
+
+    Unchanged files are taken from the cache.
+
+    Raise OSError if the file cannot be read and ValueError if it does not
+    contain a valid month. Callers must not overwrite such files.
+    """
+    data, mtime, key = _read_month_file(path)
+    month_contents = None if cache is None else cache.get(path, key)
+    if month_contents is None:
+        try:
+            month_contents = _parse_month_data(data)
+        except yaml.YAMLError as err:
+            raise ValueError(f"Error in file {path}:\n{err}") from err
+        if not isinstance(month_contents, (dict, type(None))):
+            raise ValueError(f"{path} does not contain a month")
+        if cache is not None:
+            cache.set(path, key, month_contents)
+    return Month(year_number, month_number, month_contents, mtime)
 
 
 def _get_dict(month):
@@ -116,21 +320,45 @@ def _get_dict(month):
     }
 
 
-def _save_month_to_disk(month, journal_dir):
+def _written_file_is_valid(path, data, year_number, month_number, content, fast):
     """
-    Return whether data was written to disk.
+    Check that the month file at path was written to disk successfully.
+
+    The full validation parses the file again and compares the result with
+    the month's content. The fast validation only checks that the file
+    contains the serialized bytes.
+    """
+    with open(path, "rb") as f:
+        written_data = f.read()
+    if fast:
+        return written_data == data
+    try:
+        written_contents = _parse_month_data(written_data)
+    except yaml.YAMLError:
+        return False
+    written_month = Month(year_number, month_number, written_contents)
+    return _get_dict(written_month) == content
+
+
+def _write_month_file(
+    year_number, month_number, content, mtime, journal_dir, fast_validation=False
+):
+    """
+    Write the content of a month to disk and return the new mtime of the
+    month file. Return None if nothing had to be written.
+
+    mtime is the modification time of the file when the month was loaded.
 
     When overwriting 2014-12.txt:
-        write new content to 2014-12.new.txt
+        write new content to 2014-12.new.txt and flush it to disk
         check that new file is valid month file
         cp 2014-12.txt 2014-12.old.txt
         mv 2014-12.new.txt 2014-12.txt
         rm 2014-12.old.txt
     """
-    content = _get_dict(month)
 
     def get_filename(infix):
-        year_and_month = format_year_and_month(month.year_number, month.month_number)
+        year_and_month = format_year_and_month(year_number, month_number)
         return os.path.join(journal_dir, f"{year_and_month}{infix}.txt")
 
     old = get_filename(".old")
@@ -139,15 +367,18 @@ def _save_month_to_disk(month, journal_dir):
 
     # Do not save empty month files.
     if not content and not os.path.exists(filename):
-        return False
-
-    with codecs.open(new, "wb", encoding="utf-8") as f:
-        # Write readable unicode and no Python directives.
-        yaml.dump(content, f, Dumper=Dumper, allow_unicode=True)
-
-    # Check that month file was written to disk successfully.
-    written_month = _load_month_from_disk(new, month.year_number, month.month_number)
-    if _get_dict(written_month) != content:
+        return None
+
+    # Write readable unicode and no Python directives.
+    data = yaml.dump(content, Dumper=Dumper, allow_unicode=True).encode("utf-8")
+    with open(new, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    if not _written_file_is_valid(
+        new, data, year_number, month_number, content, fast_validation
+    ):
         try:
             os.remove(new)
         except OSError:
@@ -155,9 +386,9 @@ def _save_month_to_disk(month, journal_dir):
         raise OSError("writing month file to disk failed")
 
     if os.path.exists(filename):
-        mtime = os.path.getmtime(filename)
-        if mtime != month.mtime:
-            conflict = get_filename(f".CONFLICT_BACKUP{mtime}")
+        file_mtime = os.path.getmtime(filename)
+        if file_mtime != mtime:
+            conflict = get_filename(f".CONFLICT_BACKUP{file_mtime}")
             logging.debug(
                 "Last edit time of %s conflicts with edit time at file load\n"
                 "--> Backing up to %s" % (filename, conflict)
@@ -177,20 +408,504 @@ def _save_month_to_disk(month, journal_dir):
     except OSError:
         pass
 
-    month.edited = False
-    month.mtime = os.path.getmtime(filename)
     logging.info(f"Wrote file {filename}")
-    return True
+    return os.path.getmtime(filename)
 
 
-def save_months_to_disk(months, journal_dir, exit_imminent=False, saveas=False):
+class Backend:
     """
-    Update the journal on disk and return if something had to be written.
+    Interface for storing the journal in journal_dir.
+
+    Backends load Month objects and write the content of months. Writing
+    happens in the MonthWriter thread. Changes that have not been stored
+    yet are logged in the change log in change_log_dir.
+
+    Only backends that store each month in its own file can reload single
+    months that other programs changed (see get_catalog_entry()).
+    """
+
+    stores_month_files = False
+
+    def __init__(self, journal_dir, change_log_dir=None):
+        self.journal_dir = journal_dir
+        self.change_log = ChangeLog(journal_dir, change_log_dir)
+
+    def get_month_catalog(self):
+        """
+        Return a dict mapping the year-month values of all stored months to
+        (location, year, month, mtime) tuples without loading the months.
+        """
+        raise NotImplementedError
+
+    def load_month(self, catalog, year_and_month):
+        """
+        Remove the month from the catalog, load it and return it. Raise
+        OSError or ValueError if the month cannot be read.
+        """
+        raise NotImplementedError
+
+    def finish_loading(self):
+        """Called after all months have been loaded."""
+
+    def get_catalog_entry(self, path):
+        """
+        Return the catalog entry for the month stored at path or None if
+        path does not store a single month. Only used if stores_month_files
+        is True.
+        """
+        return None
+
+    def reload_month(self, entry):
+        """
+        Load the month for the catalog entry, e.g. after another program
+        changed it. Raise OSError or ValueError if the month cannot be read.
+        Only used if stores_month_files is True.
+        """
+        raise NotImplementedError
+
+    def write_month(
+        self,
+        year_number,
+        month_number,
+        content,
+        mtime,
+        fast_validation=False,
+        edited_days=None,
+    ):
+        """
+        Store the content of a month and return its new mtime. Return None
+        if nothing had to be written. Raise OSError if writing failed.
+
+        edited_days holds the numbers of the days that changed since the
+        last save or is None if any day may have changed.
+        """
+        raise NotImplementedError
+
+    def load_all_months(self):
+        """
+        Load all months and return a dict mapping year-month values to
+        month objects.
+        """
+        catalog = self.get_month_catalog()
+        months = {
+            year_and_month: self.load_month(catalog, year_and_month)
+            for year_and_month in list(catalog)
+        }
+        self.finish_loading()
+        self.replay_change_log(months)
+        return months
+
+    def replay_change_log(self, months, catalog=None):
+        """
+        Apply the logged day contents that have not been stored yet.
+        Months from the catalog are loaded first.
+
+        If the stored month changed after a day content was logged (e.g.
+        another machine synced a newer version), the stored month is kept
+        and the logged contents are written to a conflict backup.
+
+        Return a dict mapping the year-month values of the catalog months
+        that could not be loaded to the errors. Their logged contents are
+        kept in the change log.
+        """
+        conflicts = {}
+        applied_year_and_months = set()
+        errors = {}
+        for date, content, mtime in self.change_log.read():
+            year_and_month = format_year_and_month(date.year, date.month)
+            if year_and_month in errors:
+                continue
+            if catalog and year_and_month in catalog:
+                try:
+                    months[year_and_month] = self.load_month(catalog, year_and_month)
+                except (OSError, ValueError) as err:
+                    errors[year_and_month] = err
+                    continue
+            if year_and_month not in months:
+                months[year_and_month] = Month(date.year, date.month)
+            month = months[year_and_month]
+            if month.mtime > mtime:
+                logging.warning(f"Not restoring outdated unsaved changes for {date}")
+                conflicts.setdefault(month, {})[date.day] = content
+                continue
+            logging.info(f"Restoring unsaved changes for {date}")
+            month.get_day(date.day).content = content
+            applied_year_and_months.add(year_and_month)
+        for month, contents in conflicts.items():
+            self._write_conflict_backup(month, contents)
+        # Months with restored changes keep their records until they are saved.
+        self.change_log.compact(
+            {
+                format_year_and_month(month.year_number, month.month_number)
+                for month in conflicts
+            }
+            - applied_year_and_months
+        )
+        return errors
+
+    def _write_conflict_backup(self, month, contents):
+        year_and_month = format_year_and_month(month.year_number, month.month_number)
+        path = os.path.join(
+            self.journal_dir, f"{year_and_month}.CONFLICT_CHANGES{month.mtime}.txt"
+        )
+        logging.warning(f"Backing up the outdated unsaved changes to {path}")
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                yaml.dump(contents, f, Dumper=Dumper, allow_unicode=True)
+        except OSError as err:
+            logging.error(f"Conflict backup {path} could not be written: {err}")
+
+    def save_months(self, months, saveas=False, fast_validation=False):
+        """
+        Update the journal on disk and return if something had to be written.
+        """
+        something_saved = False
+        saved_year_and_months = set()
+        try:
+            for year_and_month, month in months.items():
+                # We always need to save everything when we are "saving as".
+                if month.edited or saveas:
+                    mtime = self.write_month(
+                        month.year_number,
+                        month.month_number,
+                        _get_dict(month),
+                        month.mtime,
+                        fast_validation,
+                        None if saveas else month.edited_days,
+                    )
+                    saved_year_and_months.add(year_and_month)
+                    month.edited = False
+                    if mtime is not None:
+                        month.mtime = mtime
+                        something_saved = True
+        finally:
+            self.change_log.compact(saved_year_and_months)
+        return something_saved
+
+
+class YamlBackend(Backend):
+    """
+    Store each month in a YAML file (e.g. 2010-05.txt).
+    """
+
+    stores_month_files = True
+
+    def __init__(self, journal_dir, change_log_dir=None, cache_dir=None):
+        super().__init__(journal_dir, change_log_dir)
+        self.cache_dir = cache_dir
+        self._cache = None
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            self._cache = MonthCache(self.journal_dir, self.cache_dir)
+        return self._cache
+
+    def get_month_catalog(self):
+        return get_month_catalog(self.journal_dir)
+
+    def load_month(self, catalog, year_and_month):
+        return load_month_from_catalog(catalog, year_and_month, self.cache)
+
+    def finish_loading(self):
+        self.cache.save()
+
+    def get_catalog_entry(self, path):
+        match = MONTH_FILENAME.match(os.path.basename(path))
+        if not match or os.path.dirname(path) != self.journal_dir:
+            return None
+        year_number, month_number = int(match[1]), int(match[2])
+        if month_number not in range(1, 12 + 1):
+            return None
+        return (path, year_number, month_number, os.path.getmtime(path))
+
+    def reload_month(self, entry):
+        path, year_number, month_number, _ = entry
+        data, mtime, key = _read_month_file(path)
+        try:
+            month_contents = _parse_month_data(data)
+        except yaml.YAMLError as err:
+            raise ValueError(f"Error in file {path}:\n{err}") from err
+        if not isinstance(month_contents, (dict, type(None))):
+            raise ValueError(f"{path} does not contain a month")
+        self.cache.set(path, key, month_contents)
+        self.cache.save()
+        return Month(year_number, month_number, month_contents, mtime)
+
+    def write_month(
+        self,
+        year_number,
+        month_number,
+        content,
+        mtime,
+        fast_validation=False,
+        edited_days=None,
+    ):
+        # Month files always contain all days of the month.
+        return _write_month_file(
+            year_number, month_number, content, mtime, self.journal_dir, fast_validation
+        )
+
+
+SQLITE_FILENAME = "journal.sqlite"
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS days (
+    date TEXT PRIMARY KEY,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS days_by_month ON days (year, month);
+CREATE TABLE IF NOT EXISTS tags (
+    date TEXT NOT NULL,
+    tag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tags_by_tag ON tags (tag);
+CREATE INDEX IF NOT EXISTS tags_by_date ON tags (date);
+"""
+
+
+class SqliteBackend(Backend):
     """
-    something_saved = False
+    Store one row per day in an SQLite database. The day content is stored
+    as JSON. The escaped tags of each day are stored in an indexed table.
+
+    Only days whose content changed are written. If the edited days are
+    unknown, the stored days of the month are compared to the new content.
+    """
+
+    def __init__(self, journal_dir, change_log_dir=None):
+        super().__init__(journal_dir, change_log_dir)
+        self.path = os.path.join(journal_dir, SQLITE_FILENAME)
+
+    def _connect(self):
+        # Connections cannot be shared between threads, so open one per call.
+        connection = sqlite3.connect(self.path)
+        connection.executescript(SQLITE_SCHEMA)
+        return connection
+
+    def get_month_catalog(self):
+        with contextlib.closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT DISTINCT year, month FROM days ORDER BY year, month"
+            ).fetchall()
+        return {
+            format_year_and_month(year_number, month_number): (
+                self.path,
+                year_number,
+                month_number,
+                None,
+            )
+            for year_number, month_number in rows
+        }
+
+    def load_month(self, catalog, year_and_month):
+        _, year_number, month_number, _ = catalog.pop(year_and_month)
+        with contextlib.closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT day, content FROM days WHERE year = ? AND month = ?",
+                (year_number, month_number),
+            ).fetchall()
+        month_contents = {
+            day_number: json.loads(content) for day_number, content in rows
+        }
+        return Month(year_number, month_number, month_contents)
+
+    def write_month(
+        self,
+        year_number,
+        month_number,
+        content,
+        mtime,
+        fast_validation=False,
+        edited_days=None,
+    ):
+        month = Month(year_number, month_number, copy.deepcopy(content))
+        new = {
+            str(day): json.dumps(
+                day.content, ensure_ascii=False, sort_keys=True, default=str
+            )
+            for day_number, day in month.days.items()
+            if edited_days is None or day_number in edited_days
+        }
+        try:
+            with contextlib.closing(self._connect()) as connection, connection:
+                if edited_days is None:
+                    stored = dict(
+                        connection.execute(
+                            "SELECT date, content FROM days "
+                            "WHERE year = ? AND month = ?",
+                            (year_number, month_number),
+                        )
+                    )
+                    changed = [date for date in new if new[date] != stored.get(date)]
+                    removed = [date for date in stored if date not in new]
+                else:
+                    # Edited days that are missing from the content are empty.
+                    changed = list(new)
+                    removed = [
+                        datetime.date(year_number, month_number, day_number).isoformat()
+                        for day_number in sorted(edited_days)
+                        if day_number not in month.days
+                    ]
+                for date in changed + removed:
+                    connection.execute("DELETE FROM tags WHERE date = ?", (date,))
+                for date in removed:
+                    connection.execute("DELETE FROM days WHERE date = ?", (date,))
+                for date in changed:
+                    day = month.days[int(date[-2:])]
+                    connection.execute(
+                        "INSERT OR REPLACE INTO days VALUES (?, ?, ?, ?, ?)",
+                        (date, year_number, month_number, day.date.day, new[date]),
+                    )
+                    connection.executemany(
+                        "INSERT INTO tags VALUES (?, ?)",
+                        [
+                            (date, tag)
+                            for tag in {escape_tag(c) for c in day.categories}
+                        ],
+                    )
+        except sqlite3.Error as err:
+            raise OSError(f"writing to {self.path} failed: {err}") from err
+        if not (changed or removed):
+            return None
+        logging.info(f"Wrote {len(changed) + len(removed)} days to {self.path}")
+        return 0
+
+
+def get_backend(journal_dir, change_log_dir=None, cache_dir=None):
+    """
+    Return the backend for the journal in journal_dir. New journals use
+    YAML files.
+    """
+    if os.path.exists(os.path.join(journal_dir, SQLITE_FILENAME)):
+        return SqliteBackend(journal_dir, change_log_dir)
+    return YamlBackend(journal_dir, change_log_dir, cache_dir)
+
+
+BACKENDS = {"yaml": YamlBackend, "sqlite": SqliteBackend}
+
+
+def get_month_snapshots(months, saveas=False):
+    """
+    Return (month, content, mtime, edited days) copies of all months that need saving
+    and mark the months as saved.
+
+    The copies can be written by the MonthWriter while the months are
+    edited further. Months that could not be written have to be marked as
+    edited again.
+    """
+    snapshots = []
     for month in months.values():
         # We always need to save everything when we are "saving as".
         if month.edited or saveas:
-            something_saved |= _save_month_to_disk(month, journal_dir)
+            content = copy.deepcopy(_get_dict(month))
+            edited_days = None if saveas else month.edited_days
+            snapshots.append((month, content, month.mtime, edited_days))
+            month.edited = False
+    return snapshots
+
 
-    return something_saved
+class MonthWriter:
+    """
+    Write month snapshots to disk in a dedicated background thread.
+
+    Jobs are processed in the order in which they are submitted.
+    """
+
+    def __init__(self):
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="MonthWriter"
+        )
+        # Map paths of written files to their (old mtime, new mtime) pair.
+        # Snapshots taken before the main thread learned about a write still
+        # hold the old mtime, which would cause a spurious conflict backup.
+        # Only accessed from the writer thread.
+        self._written_mtimes = {}
+
+    def submit(self, snapshots, backend, fast_validation=False):
+        """
+        Return a future for a (stored, error) pair. "stored" is a list of
+        (month, new mtime) pairs for the stored months, where the new mtime
+        is None if nothing had to be written. "error" is None or the
+        exception that stopped the job.
+        """
+        return self.executor.submit(self._write, snapshots, backend, fast_validation)
+
+    def log_day(self, day, backend):
+        """Append the day's content to the change log of the backend."""
+        # Copy the content now, since days modify their content in place.
+        content = copy.deepcopy(day.content)
+        self.executor.submit(self._log_day, day.date, content, day.month.mtime, backend)
+
+    def discard_logged_changes(self, year_and_month, backend):
+        """Remove the logged changes of a month that has been replaced."""
+        self.executor.submit(backend.change_log.compact, {year_and_month})
+
+    def _get_current_mtime(self, backend, year_and_month, mtime):
+        path = os.path.join(backend.journal_dir, year_and_month)
+        old_mtime, new_mtime = self._written_mtimes.get(path, (None, None))
+        return new_mtime if mtime == old_mtime else mtime
+
+    def _log_day(self, date, content, mtime, backend):
+        year_and_month = format_year_and_month(date.year, date.month)
+        mtime = self._get_current_mtime(backend, year_and_month, mtime)
+        backend.change_log.append(ChangeLog.format_record(date, content, mtime))
+
+    def _write(self, snapshots, backend, fast_validation):
+        stored = []
+        saved_year_and_months = set()
+        error = None
+        for month, content, mtime, edited_days in snapshots:
+            year_and_month = format_year_and_month(
+                month.year_number, month.month_number
+            )
+            path = os.path.join(backend.journal_dir, year_and_month)
+            mtime = self._get_current_mtime(backend, year_and_month, mtime)
+            try:
+                written_mtime = backend.write_month(
+                    month.year_number,
+                    month.month_number,
+                    content,
+                    mtime,
+                    fast_validation,
+                    edited_days,
+                )
+            except Exception as err:
+                # Catch all errors (e.g., in the YAML serialization), since
+                # the months that were not stored have to be saved again.
+                if not isinstance(err, OSError):
+                    logging.exception(f"Storing {year_and_month} failed")
+                error = err
+                break
+            saved_year_and_months.add(year_and_month)
+            if written_mtime is not None:
+                self._written_mtimes[path] = (mtime, written_mtime)
+            stored.append((month, written_mtime))
+        # Changes are logged in this thread before the job starts, so the
+        # saved months contain all logged changes for them.
+        backend.change_log.compact(saved_year_and_months)
+        return stored, error
+
+    def shutdown(self):
+        """Wait for all pending jobs and stop the writer thread."""
+        self.executor.shutdown(wait=True)
+
+
+def load_all_months_from_disk(data_dir):
+    """
+    Load all months and return a dict mapping year-month values
+    to month objects.
+    """
+    return get_backend(data_dir).load_all_months()
+
+
+def save_months_to_disk(
+    months, journal_dir, exit_imminent=False, saveas=False, fast_validation=False
+):
+    """
+    Update the journal on disk and return if something had to be written.
+    """
+    return get_backend(journal_dir).save_months(months, saveas, fast_validation)
@@ -149,6 +149,8 @@ class Filenames(dict):
         user_paths = {
             "template_dir": "templates",
             "temp_dir": "tmp",
+            "change_log_dir": "changes",
+            "cache_dir": "cache",
             "default_data_dir": "data",
             "config_file": "configuration.cfg",
             "log_file": "rednotebook.log",
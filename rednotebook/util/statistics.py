@@ -79,6 +79,7 @@ class Statistics:
 
     def show_dialog(self, dialog):
         self.journal.save_old_day()
+        self.journal.load_all_months()
         self.days = self.journal.days
 
         dialog.show_all()
@@ -0,0 +1,168 @@
+# -----------------------------------------------------------------------
+# Copyright (c) 2009  Jendrik Seipp
+#
+# RedNotebook is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# RedNotebook is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with RedNotebook; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+# -----------------------------------------------------------------------
+
+import logging
+import os
+
+from gi.repository import Gio, GLib, Gtk
+
+from rednotebook import storage
+
+
+# Milliseconds to wait for more events before reading changed files. This
+# gives synchronization tools time to finish writing.
+DELAY = 1000
+KEEP_MINE = 100
+LOAD_CHANGED_FILE = 200
+
+HANDLED_EVENTS = {
+    Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+    Gio.FileMonitorEvent.CREATED,
+}
+
+
+class JournalWatcher:
+    """
+    Watch the journal directory and merge month files that have been
+    changed by another program, e.g. a file synchronization tool.
+    """
+
+    def __init__(self, journal):
+        self.journal = journal
+        self.monitor = None
+        self.timeout = None
+        self.changed_paths = set()
+        # Map paths to the mtimes of versions that the user didn't load.
+        self.ignored_mtimes = {}
+
+    def watch(self, data_dir):
+        self.stop()
+        if not self.journal.backend.stores_month_files:
+            # E.g., changes to the SQLite database cannot be merged per month.
+            logging.info(f"Not watching {data_dir}, since it has no month files")
+            return
+        try:
+            self.monitor = Gio.File.new_for_path(data_dir).monitor_directory(
+                Gio.FileMonitorFlags.NONE, None
+            )
+        except GLib.Error as err:
+            logging.warning(f"Cannot watch {data_dir} for changes: {err}")
+            return
+        self.monitor.connect("changed", self.on_changed)
+
+    def stop(self):
+        if self.monitor is not None:
+            self.monitor.cancel()
+            self.monitor = None
+        if self.timeout is not None:
+            GLib.source_remove(self.timeout)
+            self.timeout = None
+        self.changed_paths.clear()
+        self.ignored_mtimes.clear()
+
+    def on_changed(self, _monitor, file, _other_file, event_type):
+        if event_type not in HANDLED_EVENTS:
+            return
+        self.changed_paths.add(file.get_path())
+        if self.timeout is None:
+            self.timeout = GLib.timeout_add(DELAY, self.process_changes)
+
+    def process_changes(self):
+        """
+        Merge the changed month files. Returns whether the function should
+        be called again.
+        """
+        if self.journal.pending_saves:
+            # Wait until we know the mtimes of the files we wrote ourselves.
+            return True
+        self.timeout = None
+        paths = sorted(self.changed_paths)
+        self.changed_paths.clear()
+        for path in paths:
+            self.merge_month(path)
+        return False
+
+    def merge_month(self, path):
+        journal = self.journal
+        try:
+            entry = journal.backend.get_catalog_entry(path)
+        except OSError:
+            # The file has been removed again.
+            return
+        if entry is None:
+            return
+        _, year_number, month_number, mtime = entry
+        year_and_month = storage.format_year_and_month(year_number, month_number)
+
+        if year_and_month in journal.month_catalog:
+            # The month has not been loaded yet, so load the new version later.
+            journal.month_catalog[year_and_month] = entry
+            return
+
+        month = journal.months.get(year_and_month)
+        if month is not None and month.mtime == mtime:
+            # We wrote this version ourselves.
+            return
+        if self.ignored_mtimes.get(path) == mtime:
+            return
+
+        if month is journal.month:
+            # Pass the text from the editor to the day.
+            journal.save_old_day()
+
+        try:
+            new_month = journal.backend.reload_month(entry)
+        except (OSError, ValueError) as err:
+            logging.warning(f"Cannot load changed month file: {err}")
+            return
+
+        if month is not None and month.edited:
+            if not self._ask_to_load_changed_file(path):
+                # Keep the edited month. Saving it creates a conflict backup
+                # of the changed file.
+                self.ignored_mtimes[path] = mtime
+                return
+            journal.month_writer.discard_logged_changes(year_and_month, journal.backend)
+
+        logging.info(f"Loading month file {path} that was changed externally")
+        journal.replace_month(year_and_month, new_month)
+
+    def _ask_to_load_changed_file(self, path):
+        dialog = Gtk.MessageDialog(
+            parent=self.journal.frame.main_frame,
+            type=Gtk.MessageType.WARNING,
+            flags=Gtk.DialogFlags.MODAL | Gtk.DialogFlags.DESTROY_WITH_PARENT,
+            message_format=_("The file %s has been changed by another program.")
+            % os.path.basename(path),
+        )
+        dialog.set_title(_("Conflict"))
+        dialog.format_secondary_text(
+            _(
+                "This month also has unsaved changes. If you keep your changes, "
+                "a backup of the changed file will be created when saving."
+            )
+        )
+        dialog.add_buttons(
+            _("Keep my changes"),
+            KEEP_MINE,
+            _("Load the changed file"),
+            LOAD_CHANGED_FILE,
+        )
+        answer = dialog.run()
+        dialog.destroy()
+        return answer == LOAD_CHANGED_FILE
@@ -0,0 +1,45 @@
+"""
+Convert a RedNotebook journal between the YAML and the SQLite storage format.
+
+The converted journal is written to a new directory, so the original journal
+stays untouched. Open the new directory with "Journal -> Open" afterwards.
+
+    python3 scripts/convert_journal.py --to sqlite ~/.rednotebook/data ~/journal-db
+    python3 scripts/convert_journal.py --to yaml ~/journal-db ~/journal-yaml
+"""
+
+import argparse
+import os
+import sys
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(DIR)
+
+sys.path.insert(0, REPO)
+
+from rednotebook import storage  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("source", help="directory of the existing journal")
+    parser.add_argument("target", help="new or empty directory")
+    parser.add_argument(
+        "--to", choices=sorted(storage.BACKENDS), required=True, help="target format"
+    )
+    args = parser.parse_args()
+
+    if os.path.exists(args.target) and os.listdir(args.target):
+        sys.exit(f"Error: {args.target} is not empty.")
+    os.makedirs(args.target, exist_ok=True)
+
+    source_backend = storage.get_backend(args.source)
+    target_backend = storage.BACKENDS[args.to](args.target)
+    print(f"Converting {args.source} ({type(source_backend).__name__})")
+    months = source_backend.load_all_months()
+    target_backend.save_months(months, saveas=True)
+    print(f"Wrote {len(months)} months to {args.target} ({args.to})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+from rednotebook.gui.cloud_filter import (
+    get_regex,
+    select_most_frequent_words,
+    WordFilter,
+)
+
+
+def test_word_filter():
+    patterns = [
+        "the",
+        "Mom",
+        "c\\+\\+",
+        "a.b",
+        "walk(ed|ing)",
+        "\\d+",
+        "[",
+        "(?i)x",
+        "don't",
+    ]
+    words = [
+        "the",
+        "The",
+        "THE",
+        "them",
+        "other",
+        "mom",
+        "c++",
+        "c",
+        "a-b",
+        "ab",
+        "walked",
+        "Walking",
+        "walks",
+        "2019",
+        "x1",
+        "x",
+        "[",
+        "don't",
+    ]
+    word_filter = WordFilter(patterns)
+    for word in words:
+        expected = any(get_regex(pattern).match(word) for pattern in patterns)
+        assert word_filter.matches(word) == expected, word
+        assert word_filter.matches(word) == expected, word
+    assert not WordFilter([]).matches("the")
+
+
+def test_select_most_frequent_words():
+    words_and_frequencies = [("b", 1), ("c", 2), ("d", 1), ("a", 1), ("e", 3)]
+    # Words with the same frequency are selected in the given order.
+    assert select_most_frequent_words(words_and_frequencies, 3) == [
+        ("b", 1),
+        ("c", 2),
+        ("e", 3),
+    ]
+    assert select_most_frequent_words(
+        words_and_frequencies, 3, accept=lambda word: word != "b"
+    ) == [("c", 2), ("d", 1), ("e", 3)]
+    assert select_most_frequent_words(words_and_frequencies, 0) == []
@@ -1,4 +1,7 @@
-from rednotebook.data import Day, Month
+import collections
+import datetime
+
+from rednotebook.data import Day, DayIndex, Month
 
 
 def test_to_string():
@@ -24,3 +27,309 @@ def test_hashtags():
     assert day.hashtags == ["tag_with_longer_name"]
     day.text = "abc #tag def"
     assert day.hashtags == ["tag"]
+
+
+def test_edited():
+    month = Month(2000, 10, {1: {"text": "abc"}})
+    day = month.get_day(1)
+    assert not day.edited and not month.edited
+    day.text = "abc"
+    day.content = {"text": "abc"}
+    assert day.version == 0 and not month.edited
+    day.text = "abc #tag"
+    day.content = {"text": "abc #tag", "Work": None}
+    assert day.version == 2
+    assert month.edited_days == {1}
+    month.edited = False
+    assert not day.edited and day.version == 2
+    month.edited = True
+    assert month.edited_days is None
+
+
+def test_old_tags_are_converted():
+    month = Month(2000, 10, {1: {"text": "", "Tags": {"work": None}}})
+    assert month.get_day(1).content == {"text": "", "work": None}
+    assert month.edited_days == {1}
+
+
+def test_empty_days_are_not_stored():
+    month = Month(2000, 10, {1: {"text": "abc"}, 2: {"text": " "}})
+    assert list(month.days) == [1]
+    day = month.get_day(3)
+    assert month.get_day(3) is day
+    assert 3 not in month.days
+    day.text = "abc"
+    assert month.days[3] is day
+    assert month.get_day(3) is day
+
+
+def test_derived_values_follow_content():
+    month = Month(2000, 10)
+    day = month.get_day(1)
+    day.content = {"text": "a #tag", "Work": {"Meeting": None}}
+    assert day.hashtags == ["tag"]
+    assert day.categories == ["Work", "tag"]
+    assert day.get_number_of_words() == 5
+    day.get_category_content_pairs()["Work"].append("Changed")
+    assert day.get_category_content_pairs() == {"Work": ["Meeting"], "tag": []}
+    day.text = "b #other"
+    assert day.hashtags == ["other"]
+    assert day.categories == ["Work", "other"]
+    day.content = {"text": "c"}
+    assert day.categories == []
+    assert day.get_words() == ["c"]
+
+
+def test_day_index():
+    index = DayIndex()
+    october = Month(2000, 10, {5: {"text": "a"}, 1: {"text": "b"}})
+    november = Month(2000, 11, {2: {"text": "c"}})
+    index.add_month(november)
+    index.add_month(october)
+    assert [str(day) for day in index.days] == [
+        "2000-10-01",
+        "2000-10-05",
+        "2000-11-02",
+    ]
+
+    october.get_day(20).text = "d"
+    october.get_day(1).text = ""
+    assert [str(day) for day in index.days] == [
+        "2000-10-05",
+        "2000-10-20",
+        "2000-11-02",
+    ]
+    days = index.get_days_in_date_range(
+        datetime.date(2000, 10, 6), datetime.date(2000, 11, 2)
+    )
+    assert [str(day) for day in days] == ["2000-10-20", "2000-11-02"]
+    assert str(index.find_next(datetime.date(2000, 10, 21))) == "2000-11-02"
+    assert str(index.find_previous(datetime.date(2000, 10, 19))) == "2000-10-05"
+    assert index.find_next(datetime.date(2000, 11, 3)) is None
+    assert index.find_previous(datetime.date(2000, 10, 4)) is None
+
+    index.remove_month(october)
+    october.get_day(21).text = "e"
+    assert [str(day) for day in index.days] == ["2000-11-02"]
+
+
+def test_day_index_tags():
+    index = DayIndex()
+    month = Month(
+        2000,
+        10,
+        {
+            1: {"text": "#Tag #other", "Work": {"Meeting": None}},
+            2: {"text": "#tag"},
+            3: {"text": "", "Work": None},
+        },
+    )
+    index.add_month(month)
+    assert sorted(index.categories) == ["Work", "other", "tag"]
+    assert [str(day) for day in index.get_days_with_tags(["tag"])] == [
+        "2000-10-01",
+        "2000-10-02",
+    ]
+    assert [str(day) for day in index.get_days_with_tags(["tag", "work"])] == [
+        "2000-10-01"
+    ]
+    assert index.get_days_with_tags(["missing"]) == []
+    days = index.get_days_with_categories(["Work", "other"])
+    assert [str(day) for day in days] == ["2000-10-01", "2000-10-03"]
+
+    month.get_day(1).text = "no tags"
+    month.get_day(3).text = "#new"
+    assert sorted(index.categories) == ["Work", "new", "tag"]
+    assert [str(day) for day in index.get_days_with_tags(["work"])] == [
+        "2000-10-01",
+        "2000-10-03",
+    ]
+    index.remove_month(month)
+    assert index.categories == []
+    assert index.get_days_with_tags(["tag"]) == []
+
+
+def test_day_index_search():
+    month = Month(
+        2000,
+        10,
+        {
+            1: {"text": "Straße and more #Tag", "Work": {"Call mom": None}},
+            2: {"text": "nothing\nto see"},
+            10: {"text": "", "Home": None},
+        },
+    )
+    index = DayIndex()
+    index.add_month(month)
+    queries = ["", " ", "strasse", "e a", "AND M", "call m", "ork", "ome", "10", "-1"]
+    queries += ["0-0", "tag", "g\nt", "o\ns", "missing", "see "]
+
+    def search(days, text, tags):
+        return [day.search(text, tags) for day in days]
+
+    def get_found(results):
+        return [result for result in results if result[1]]
+
+    for tags in [[], ["tag"]]:
+        for text in queries:
+            all_days = index.get_days_with_tags(tags)
+            assert get_found(search(index.search_days(text, tags), text, tags)) == (
+                get_found(search(all_days, text, tags))
+            ), text
+    assert index.search_days("see", []) == [month.days[2]]
+    month.get_day(3).text = "I see"
+    assert index.search_days("see", []) == [month.days[2], month.days[3]]
+
+
+def test_day_index_refined_search():
+    month = Month(
+        2000,
+        10,
+        {
+            1: {"text": "meeting #work"},
+            2: {"text": "meet"},
+            3: {"text": "meeting"},
+        },
+    )
+    index = DayIndex()
+    index.add_month(month)
+    index.remember_search("meet", [], {month.days[1].date, month.days[3].date})
+    # Only the remembered days are searched for refined queries.
+    assert index.search_days("MEETI", []) == [month.days[1], month.days[3]]
+    assert index.search_days("meeting", ["work"]) == [month.days[1]]
+    assert len(index.search_days("mee", [])) == 3
+    # Editing a day invalidates the remembered searches.
+    month.get_day(2).text = "meeting"
+    assert index.search_days("meeting", []) == [
+        month.days[1],
+        month.days[2],
+        month.days[3],
+    ]
+
+
+def test_match_offsets():
+    month = Month(2000, 10, {1: {"text": "Straße and strasse, STRASSE"}})
+    day = month.get_day(1)
+    assert day.get_match_offsets("strasse") == [(0, 6), (11, 18), (20, 27)]
+    assert day.get_match_offsets("and") == [(7, 10)]
+    assert day.get_match_offsets("missing") == []
+    assert day.get_match_offsets("") == []
+
+
+def test_search_casefolds():
+    month = Month(
+        2000,
+        10,
+        {1: {"text": "Große STRASSE", "Straße": {"Maße": None}, "ΣΊΣΥΦΟΣ": None}},
+    )
+    day = month.get_day(1)
+    assert day.search_in_text("GROSSE").startswith("STARTBOLDGroßeENDBOLD")
+    assert day.get_match_offsets("ss") == [(3, 4), (10, 12)]
+    assert day.search_in_categories("strasse") == ["Maße"]
+    assert day.search_in_categories("masse") == ["Maße"]
+    assert day.search_in_categories("σίσυφος") == ["ΣΊΣΥΦΟΣ"]
+    assert day.search("2000-10", [])[1] == ["Große STRASSE"]
+
+
+def test_day_index_rank_days():
+    month = Month(
+        2000,
+        10,
+        {
+            1: {"text": "cat " + "filler " * 20},
+            2: {"text": "cat cat dog"},
+            3: {"text": "dog"},
+            4: {"text": "cat dog"},
+        },
+    )
+    index = DayIndex()
+    index.add_month(month)
+    days = index.search_days("cat", [])
+    ranked = [day.date.day for day in index.rank_days("cat", days)]
+    assert ranked == [2, 4, 1]
+    # Matches in long days weigh less than in short days.
+    ranked = [day.date.day for day in index.rank_days("CAT dog", index.days)]
+    assert ranked == [2, 4, 3, 1]
+
+
+def test_day_index_word_counts():
+    month = Month(2000, 10, {1: {"text": "Cat cat dog.", "Pets": {"Cat": None}}})
+    index = DayIndex()
+    index.add_month(month)
+
+    def count_words():
+        counts = collections.Counter()
+        for day in index.days:
+            counts.update(word.lower() for word in day.get_words())
+        return counts
+
+    assert index.get_word_counts() == {"cat": 3, "dog": 1, "pets": 1}
+    month.get_day(1).text = "Dog"
+    month.get_day(2).text = "Bird"
+    assert index.get_word_counts() == count_words()
+    month.get_day(2).content = {"text": "Bird", "Pets": {"Bird": None}}
+    assert index.get_word_counts() == count_words()
+    assert index.get_category_counts() == {"Pets": 2}
+    month.get_day(1).content = {"text": ""}
+    assert index.get_word_counts() == {"bird": 2, "pets": 1}
+    assert index.get_category_counts() == {"Pets": 1}
+    index.remove_month(month)
+    assert index.get_word_counts() == {}
+
+
+def test_day_index_counts_in_date_range():
+    index = DayIndex()
+    for month_number in (1, 2, 3):
+        index.add_month(
+            Month(
+                2000,
+                month_number,
+                {
+                    1: {"text": "first words", "Work": None},
+                    15: {"text": "middle words"},
+                    28: {"text": "last words", "Work": None},
+                },
+            )
+        )
+    start, end = datetime.date(2000, 1, 15), datetime.date(2000, 3, 1)
+    assert index.get_word_counts(start, end) == {
+        "first": 2,
+        "middle": 2,
+        "last": 2,
+        "words": 6,
+        "work": 4,
+    }
+    assert index.get_category_counts(start, end) == {"Work": 4}
+    assert index.get_category_counts(end_date=datetime.date(2000, 1, 31)) == {"Work": 2}
+    assert index.get_word_counts(datetime.date(2001, 1, 1)) == {}
+    index.days[0].text = "changed"
+    assert index.get_word_counts(None, datetime.date(2000, 1, 1)) == {
+        "changed": 1,
+        "work": 1,
+    }
+
+
+def test_day_index_fuzzy_search():
+    month = Month(
+        2000,
+        10,
+        {
+            1: {"text": "My journal"},
+            2: {"text": "A journey", "Work": {"Journalism": None}},
+            3: {"text": "Nothing"},
+        },
+    )
+    index = DayIndex()
+    index.add_month(month)
+    assert index.search_days("urna", []) == [month.days[1], month.days[2]]
+    assert index.search_days("urnal", []) == [month.days[1], month.days[2]]
+    assert index.search_days("urnaly", []) == []
+
+    matches = index.fuzzy_search_days("jurnal", [])
+    assert [(str(day), token) for day, token in matches] == [("2000-10-01", "journal")]
+    assert "STARTBOLDjournalENDBOLD" in month.days[1].search("JOURNAL", [])[1][0]
+    matches = index.fuzzy_search_days("jurnalism", ["work"])
+    assert [(str(day), token) for day, token in matches] == [
+        ("2000-10-02", "journalism")
+    ]
+    assert index.fuzzy_search_days("xyz", []) == []
@@ -0,0 +1,141 @@
+import datetime
+
+import pytest
+
+from rednotebook import query
+from rednotebook.data import DayIndex, Month
+
+
+@pytest.fixture
+def index():
+    index = DayIndex()
+    index.add_month(
+        Month(
+            2019,
+            3,
+            {
+                1: {"text": "Meeting with Anna #work"},
+                2: {"text": "Called mom", "Todo": {"Buy milk": None}},
+            },
+        )
+    )
+    index.add_month(
+        Month(
+            2021,
+            12,
+            {
+                24: {"text": "Christmas with mom and Anna #family"},
+                31: {"text": "Meeting about the release #work"},
+            },
+        )
+    )
+    return index
+
+
+def get_dates(index, text):
+    return [str(date) for date in sorted(query.parse(text).get_dates(index))]
+
+
+def test_is_query():
+    assert not query.is_query("meeting #work")
+    assert not query.is_query("2019-03")
+    assert not query.is_query("-")
+    assert query.is_query('"call mom"')
+    assert query.is_query("anna OR mom")
+    assert query.is_query("before:2020")
+
+
+def test_operators(index):
+    assert get_dates(index, "anna mom") == ["2021-12-24"]
+    assert get_dates(index, "anna AND mom") == ["2021-12-24"]
+    assert get_dates(index, "anna OR milk") == [
+        "2019-03-01",
+        "2019-03-02",
+        "2021-12-24",
+    ]
+    assert get_dates(index, "meeting NOT #work") == []
+    assert get_dates(index, "NOT (meeting OR mom)") == []
+    assert get_dates(index, "(anna OR mom) #family") == ["2021-12-24"]
+    assert get_dates(index, "#Todo OR #family") == ["2019-03-02", "2021-12-24"]
+
+
+def test_phrases(index):
+    assert get_dates(index, '"with anna"') == ["2019-03-01"]
+    assert get_dates(index, '"mom and"') == ["2021-12-24"]
+    assert get_dates(index, '"buy milk') == ["2019-03-02"]
+    assert get_dates(index, '"2019-03"') == ["2019-03-01", "2019-03-02"]
+
+
+def test_date_filters(index):
+    assert get_dates(index, "date:2019") == ["2019-03-01", "2019-03-02"]
+    assert get_dates(index, "date:2019-03-02..2021-12") == [
+        "2019-03-02",
+        "2021-12-24",
+        "2021-12-31",
+    ]
+    assert get_dates(index, "meeting date:2021..") == ["2021-12-31"]
+    assert get_dates(index, "before:2019-03-02") == ["2019-03-01"]
+    assert get_dates(index, "after:2021-12-24") == ["2021-12-31"]
+    assert query.parse("date:2020-02").get_dates(index) == set()
+    assert query.parse("date:2020-02").end == datetime.date(2020, 2, 29)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "anna OR",
+        "(anna",
+        "anna)",
+        "date:2019-13",
+        "after:soon",
+        "date:..",
+        "before:0001",
+    ],
+)
+def test_invalid_queries(text):
+    with pytest.raises(query.QueryError):
+        query.parse(text)
+
+
+def test_search_results(index):
+    # AND binds more tightly than OR.
+    results = list(query.search(index, query.parse("mom OR milk NOT anna")))
+    assert [result[0] for result in results] == ["2021-12-24", "2019-03-02"]
+    results = list(query.search(index, query.parse("(mom OR milk) NOT anna")))
+    assert results == [
+        ("2019-03-02", ["...  STARTBOLDmomENDBOLD", "Buy milk"], [(7, 10)])
+    ]
+    results = list(query.search(index, query.parse("#family")))
+    assert results == [("2021-12-24", ["Christmas with mom and Anna #family"], [])]
+
+
+def test_ranked_search_results(index):
+    results = query.search(index, query.parse("meeting OR anna"), rank=True)
+    assert [result[0] for result in results] == [
+        "2019-03-01",
+        "2021-12-31",
+        "2021-12-24",
+    ]
+
+
+def test_parse_period():
+    today = datetime.date(2020, 3, 15)
+    assert query.parse_period("", today) == (None, None)
+    assert query.parse_period("All", today) == (None, None)
+    assert query.parse_period("30 days", today) == (datetime.date(2020, 2, 15), today)
+    assert query.parse_period("last 1 day", today) == (today, today)
+    assert query.parse_period("this month", today) == (datetime.date(2020, 3, 1), today)
+    assert query.parse_period("this year", today) == (datetime.date(2020, 1, 1), today)
+    assert query.parse_period("2019..2019-06", today) == (
+        datetime.date(2019, 1, 1),
+        datetime.date(2019, 6, 30),
+    )
+    assert query.parse_period("2019-02..", today) == (datetime.date(2019, 2, 1), None)
+    assert query.parse_period(f"{today.toordinal()} days", today) == (
+        datetime.date.min,
+        today,
+    )
+    periods = ["0 days", "1000000 days", "99999999999 days", "yesterday", "2019..20"]
+    for period in periods:
+        with pytest.raises(query.QueryError):
+            query.parse_period(period, today)
@@ -0,0 +1,357 @@
+import datetime
+import os
+import sqlite3
+
+import pytest
+
+from rednotebook import storage
+from rednotebook.data import Month
+
+
+@pytest.fixture(autouse=True)
+def change_log_dir(tmp_path_factory, monkeypatch):
+    change_log_dir = str(tmp_path_factory.mktemp("changes"))
+    monkeypatch.setattr(storage, "DEFAULT_CHANGE_LOG_DIR", change_log_dir)
+    return change_log_dir
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch):
+    cache_dir = str(tmp_path_factory.mktemp("cache"))
+    monkeypatch.setattr(storage, "DEFAULT_CACHE_DIR", cache_dir)
+    return cache_dir
+
+
+def _write_journal(journal_dir, number_of_months):
+    months = {}
+    for index in range(number_of_months):
+        year_number, month_number = 2000 + index // 12, index % 12 + 1
+        month = Month(year_number, month_number)
+        month.get_day(1).text = f"Text for {year_number}-{month_number} #tag"
+        month.get_day(2).content = {"text": "", "Work": {"Meeting": None}}
+        months[storage.format_year_and_month(year_number, month_number)] = month
+    storage.save_months_to_disk(months, str(journal_dir), saveas=True)
+    return months
+
+
+def _get_contents(months):
+    return {key: storage._get_dict(month) for key, month in months.items()}
+
+
+def test_load_all_months(tmp_path):
+    months = _write_journal(tmp_path, 30)
+    loaded_months = storage.load_all_months_from_disk(str(tmp_path))
+    assert _get_contents(loaded_months) == _get_contents(months)
+
+
+def test_corrupt_month_raises_error(tmp_path):
+    _write_journal(tmp_path, 30)
+    with open(os.path.join(tmp_path, "2001-03.txt"), "w") as f:
+        f.write("1: {text: [unclosed\n")
+    with pytest.raises(ValueError):
+        storage.load_all_months_from_disk(str(tmp_path))
+
+
+def test_unreadable_month_is_not_replayed(tmp_path):
+    _write_journal(tmp_path, 2)
+    with open(os.path.join(tmp_path, "2000-02.txt"), "w") as f:
+        f.write("- not a month\n")
+    backend = storage.YamlBackend(str(tmp_path))
+    change_log = backend.change_log
+    change_log.append(
+        change_log.format_record(datetime.date(2000, 2, 1), {"text": "new"}, 0)
+    )
+    catalog = backend.get_month_catalog()
+    with pytest.raises(ValueError):
+        backend.load_month(dict(catalog), "2000-02")
+
+    months = {}
+    errors = backend.replay_change_log(months, catalog)
+    assert list(errors) == ["2000-02"]
+    assert "2000-02" not in months
+    assert "2000-02" not in catalog
+    # The logged contents are kept until the month can be read again.
+    assert [date for date, _, _ in change_log.read()] == [datetime.date(2000, 2, 1)]
+
+
+def test_month_catalog(tmp_path):
+    months = _write_journal(tmp_path, 3)
+    catalog = storage.get_month_catalog(str(tmp_path))
+    assert sorted(catalog) == ["2000-01", "2000-02", "2000-03"]
+    path, year_number, month_number, mtime = catalog["2000-02"]
+    assert (year_number, month_number) == (2000, 2)
+    assert mtime == os.path.getmtime(path)
+
+    month = storage.load_month_from_catalog(catalog, "2000-02")
+    assert storage._get_dict(month) == storage._get_dict(months["2000-02"])
+    assert "2000-02" not in catalog
+
+
+def test_cache_skips_parsing_unchanged_months(tmp_path, monkeypatch, cache_dir):
+    months = _write_journal(tmp_path, 3)
+    storage.load_all_months_from_disk(str(tmp_path))
+    assert os.listdir(cache_dir) == [
+        os.path.basename(storage.MonthCache(str(tmp_path)).path)
+    ]
+    assert sorted(os.listdir(tmp_path)) == ["2000-01.txt", "2000-02.txt", "2000-03.txt"]
+
+    # Change one month file. Only this file must be parsed again.
+    changed_path = os.path.join(tmp_path, "2000-02.txt")
+    with open(changed_path, "w") as f:
+        f.write("3: {text: changed}\n")
+    parsed_data = []
+    parse_month_data = storage._parse_month_data
+
+    def parse(data):
+        parsed_data.append(data)
+        return parse_month_data(data)
+
+    monkeypatch.setattr(storage, "_parse_month_data", parse)
+    loaded_months = storage.load_all_months_from_disk(str(tmp_path))
+    assert parsed_data == [b"3: {text: changed}\n"]
+    assert storage._get_dict(loaded_months["2000-02"]) == {3: {"text": "changed"}}
+    assert storage._get_dict(loaded_months["2000-03"]) == storage._get_dict(
+        months["2000-03"]
+    )
+
+
+@pytest.mark.parametrize("cache_data", [b"", b"garbage", b"\xe9\x02\x00\x00\x00"])
+def test_corrupt_cache_is_rebuilt(tmp_path, cache_data):
+    months = _write_journal(tmp_path, 3)
+    cache_path = storage.MonthCache(str(tmp_path)).path
+    with open(cache_path, "wb") as f:
+        f.write(cache_data)
+    loaded_months = storage.load_all_months_from_disk(str(tmp_path))
+    assert _get_contents(loaded_months) == _get_contents(months)
+    assert storage.MonthCache(str(tmp_path)).old_entries
+
+
+@pytest.mark.parametrize("fast_validation", [False, True])
+def test_save_validation(tmp_path, fast_validation):
+    month = Month(2000, 1)
+    month.get_day(1).text = "Ünïcödé text\nwith two lines"
+    month.edited = True
+    months = {"2000-01": month}
+    assert storage.save_months_to_disk(
+        months, str(tmp_path), fast_validation=fast_validation
+    )
+    assert not month.edited
+    assert not os.path.exists(os.path.join(tmp_path, "2000-01.new.txt"))
+    loaded_months = storage.load_all_months_from_disk(str(tmp_path))
+    assert _get_contents(loaded_months) == _get_contents(months)
+
+
+def test_month_writer(tmp_path):
+    month = Month(2000, 1)
+    month.get_day(1).text = "first"
+    month.edited = True
+    months = {"2000-01": month}
+    writer = storage.MonthWriter()
+
+    snapshots = storage.get_month_snapshots(months)
+    assert not month.edited
+    # Edits after taking the snapshot are not written.
+    month.get_day(1).text = "second"
+    month.edited = True
+    written, error = writer.submit(
+        snapshots, storage.get_backend(str(tmp_path))
+    ).result()
+    assert error is None
+    assert written == [(month, os.path.getmtime(tmp_path / "2000-01.txt"))]
+    loaded_months = storage.load_all_months_from_disk(str(tmp_path))
+    assert loaded_months["2000-01"].get_day(1).text == "first"
+
+    # The second snapshot still has the old mtime, but this is no conflict.
+    written, error = writer.submit(
+        storage.get_month_snapshots(months), storage.get_backend(str(tmp_path))
+    ).result()
+    writer.shutdown()
+    assert error is None
+    assert not any("CONFLICT" in filename for filename in os.listdir(tmp_path))
+
+
+def test_month_writer_reports_all_errors(tmp_path):
+    class FailingBackend(storage.YamlBackend):
+        def write_month(self, year_number, month_number, *args):
+            if month_number == 3:
+                raise ValueError("cannot serialize")
+            return super().write_month(year_number, month_number, *args)
+
+    # Nothing has to be written for an empty new month.
+    months = {"1999-12": Month(1999, 12), **_write_journal(tmp_path, 3)}
+    months["1999-12"].edited = True
+    months["2000-02"].get_day(5).text = "new"
+    months["2000-03"].get_day(5).text = "failing"
+    writer = storage.MonthWriter()
+    snapshots = storage.get_month_snapshots(months)
+    stored, error = writer.submit(snapshots, FailingBackend(str(tmp_path))).result()
+    writer.shutdown()
+    assert isinstance(error, ValueError)
+    assert [(month, mtime is None) for month, mtime in stored] == [
+        (months["1999-12"], True),
+        (months["2000-02"], False),
+    ]
+
+
+def test_change_log_is_replayed(tmp_path, change_log_dir):
+    months = _write_journal(tmp_path, 2)
+    mtime = months["2000-02"].mtime
+    change_log = storage.ChangeLog(str(tmp_path))
+    assert os.path.dirname(change_log.path) == change_log_dir
+    change_log.append(
+        change_log.format_record(datetime.date(2000, 2, 1), {"text": "old"}, mtime)
+    )
+    change_log.append(
+        change_log.format_record(datetime.date(2000, 2, 1), {"text": "new"}, mtime)
+    )
+    change_log.append(
+        change_log.format_record(datetime.date(2000, 5, 3), {"text": "May"}, 0)
+    )
+    # Simulate a crash while writing a record.
+    with open(change_log.path, "a") as f:
+        f.write('{"date": "2000-01-0')
+
+    months = storage.load_all_months_from_disk(str(tmp_path))
+    assert months["2000-02"].get_day(1).text == "new"
+    assert months["2000-02"].edited
+    assert months["2000-05"].get_day(3).text == "May"
+    assert not months["2000-01"].edited
+
+    storage.save_months_to_disk(months, str(tmp_path))
+    assert not os.path.exists(change_log.path)
+    months = storage.load_all_months_from_disk(str(tmp_path))
+    assert months["2000-02"].get_day(1).text == "new"
+    assert not months["2000-02"].edited
+
+
+def test_change_logs_are_kept_per_journal(tmp_path):
+    first_dir, second_dir = tmp_path / "first", tmp_path / "second"
+    for journal_dir in [first_dir, second_dir]:
+        journal_dir.mkdir()
+        _write_journal(journal_dir, 1)
+    change_log = storage.ChangeLog(str(first_dir))
+    assert change_log.path != storage.ChangeLog(str(second_dir)).path
+    mtime = os.path.getmtime(first_dir / "2000-01.txt")
+    change_log.append(
+        change_log.format_record(datetime.date(2000, 1, 5), {"text": "new"}, mtime)
+    )
+    assert sorted(os.listdir(first_dir)) == sorted(os.listdir(second_dir))
+    assert storage.load_all_months_from_disk(str(first_dir))["2000-01"].edited
+    assert not storage.load_all_months_from_disk(str(second_dir))["2000-01"].edited
+
+
+def test_outdated_changes_are_backed_up(tmp_path):
+    months = _write_journal(tmp_path, 1)
+    change_log = storage.ChangeLog(str(tmp_path))
+    change_log.append(
+        change_log.format_record(
+            datetime.date(2000, 1, 5), {"text": "outdated"}, months["2000-01"].mtime - 1
+        )
+    )
+
+    months = storage.load_all_months_from_disk(str(tmp_path))
+    assert months["2000-01"].get_day(5).empty
+    assert not months["2000-01"].edited
+    assert not os.path.exists(change_log.path)
+    (backup,) = [name for name in os.listdir(tmp_path) if "CONFLICT_CHANGES" in name]
+    assert backup.startswith("2000-01.")
+    assert "outdated" in (tmp_path / backup).read_text()
+
+
+def test_month_writer_compacts_change_log(tmp_path):
+    months = _write_journal(tmp_path, 2)
+    backend = storage.get_backend(str(tmp_path))
+    writer = storage.MonthWriter()
+    for key in ["2000-01", "2000-02"]:
+        day = months[key].get_day(5)
+        day.text = f"Changed {key}"
+        writer.log_day(day, backend)
+    # Only save the first month.
+    months["2000-02"].edited = False
+    writer.submit(storage.get_month_snapshots(months), backend).result()
+    writer.shutdown()
+    records = backend.change_log.read()
+    assert records == [
+        (
+            datetime.date(2000, 2, 5),
+            {"text": "Changed 2000-02"},
+            months["2000-02"].mtime,
+        )
+    ]
+
+
+def test_sqlite_backend(tmp_path):
+    yaml_dir, sqlite_dir, export_dir = (tmp_path / name for name in "abc")
+    for path in [yaml_dir, sqlite_dir, export_dir]:
+        path.mkdir()
+    months = _write_journal(yaml_dir, 14)
+    assert isinstance(storage.get_backend(str(yaml_dir)), storage.YamlBackend)
+
+    backend = storage.SqliteBackend(str(sqlite_dir))
+    backend.save_months(storage.load_all_months_from_disk(str(yaml_dir)), saveas=True)
+    assert isinstance(storage.get_backend(str(sqlite_dir)), storage.SqliteBackend)
+    assert not backend.stores_month_files
+    assert sorted(backend.get_month_catalog()) == sorted(months)
+    loaded_months = storage.load_all_months_from_disk(str(sqlite_dir))
+    assert _get_contents(loaded_months) == _get_contents(months)
+
+    with sqlite3.connect(backend.path) as connection:
+        tags = connection.execute(
+            "SELECT DISTINCT tag FROM tags WHERE date LIKE '2000-03-%' ORDER BY tag"
+        ).fetchall()
+    assert tags == [("tag",), ("work",)]
+
+    # Remove a day and change another one.
+    month = loaded_months["2000-03"]
+    month.get_day(1).text = ""
+    month.get_day(2).content = {"text": "changed"}
+    assert month.edited_days == {1, 2}
+    assert backend.save_months(loaded_months)
+    assert not backend.save_months(loaded_months, saveas=True)
+    reloaded_month = storage.load_all_months_from_disk(str(sqlite_dir))["2000-03"]
+    assert storage._get_dict(reloaded_month) == {2: {"text": "changed"}}
+
+    storage.YamlBackend(str(export_dir)).save_months(
+        storage.load_all_months_from_disk(str(sqlite_dir)), saveas=True
+    )
+    exported_months = storage.load_all_months_from_disk(str(export_dir))
+    assert _get_contents(exported_months) == _get_contents(
+        storage.load_all_months_from_disk(str(sqlite_dir))
+    )
+
+
+def test_sqlite_backend_only_writes_edited_days(tmp_path):
+    backend = storage.SqliteBackend(str(tmp_path))
+    backend.save_months(_write_journal(tmp_path, 1), saveas=True)
+    months = backend.load_all_months()
+    with sqlite3.connect(backend.path) as connection:
+        connection.execute('UPDATE days SET content = \'{"text": "old"}\'')
+
+    months["2000-01"].get_day(3).text = "new"
+    snapshots = storage.get_month_snapshots(months)
+    assert [edited_days for *_, edited_days in snapshots] == [{3}]
+    assert not months["2000-01"].edited
+    storage.MonthWriter().submit(snapshots, backend).result()
+
+    contents = storage._get_dict(backend.load_all_months()["2000-01"])
+    assert contents == {1: {"text": "old"}, 2: {"text": "old"}, 3: {"text": "new"}}
+
+
+def test_reload_changed_month(tmp_path):
+    _write_journal(tmp_path, 1)
+    backend = storage.YamlBackend(str(tmp_path))
+    path = os.path.join(str(tmp_path), "2000-01.txt")
+    assert backend.get_catalog_entry(os.path.join(str(tmp_path), "notes.txt")) is None
+    assert backend.get_catalog_entry(os.path.join(str(tmp_path), "2000-13.txt")) is None
+
+    with open(path, "w") as f:
+        f.write("3: {text: changed}\n")
+    month = backend.reload_month(backend.get_catalog_entry(path))
+    assert storage._get_dict(month) == {3: {"text": "changed"}}
+    assert month.mtime == os.path.getmtime(path)
+    assert not month.edited
+
+    with open(path, "w") as f:
+        f.write("3: {text: [\n")
+    with pytest.raises(ValueError):
+        backend.reload_month(backend.get_catalog_entry(path))